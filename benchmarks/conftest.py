@@ -0,0 +1,118 @@
+import asyncio
+import dataclasses
+import json
+import os
+import pytest
+
+from starkware.starknet.testing.contract import StarknetContractFunctionInvocation
+from starkware.starknet.testing.state import StarknetState
+
+from preflight import count_storage_updates
+
+
+BENCHMARKS_DIR = os.path.dirname(__file__)
+BASELINE_FILE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+REPORT_FILE = os.path.join(BENCHMARKS_DIR, 'report.json')
+
+# Allowed growth of any tracked resource over its baseline
+DEFAULT_THRESHOLD = 0.05
+
+# Recorded but not checked, as fees are charged for steps and builtins only
+UNCHECKED_RESOURCES = ('n_memory_holes',)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption(
+        '--benchmark-report', dest='benchmark_report', default=REPORT_FILE,
+        help='The json file to write the measured resources into'
+    )
+    group.addoption(
+        '--benchmark-threshold', dest='benchmark_threshold', type=float, default=DEFAULT_THRESHOLD,
+        help='The allowed growth of any resource over the baseline before failing'
+    )
+    group.addoption(
+        '--update-baseline', dest='update_baseline', action='store_true',
+        help='Save the measured resources as the new baseline instead of comparing'
+    )
+
+
+class BenchmarkRecorder:
+    """Measures the execution resources of entry point calls, and compares
+    them with the baseline recorded in baseline.json."""
+
+    def __init__(self, baseline: dict, threshold: float):
+        self.baseline = baseline
+        self.threshold = threshold
+        self.results = {}
+
+    async def measure(
+        self,
+        name: str,
+        invocation: StarknetContractFunctionInvocation,
+        caller_address: int = 0,
+        execute: bool = False
+    ) -> list[str]:
+        """Runs the invocation, records its resources under the name and
+        returns the resources that regressed past the threshold."""
+        # Run on a layer over the state, so that its writes can be compared
+        # with the state as the call found it
+        state = invocation.state
+        layer = state.state._copy()
+        execution_info = await dataclasses.replace(
+            invocation, state=StarknetState(state=layer, general_config=state.general_config)
+        ).execute(caller_address=caller_address)
+        storage_updates = await count_storage_updates(layer, state.state)
+        if execute:
+            layer._apply(parent=state.state)
+
+        resources = execution_info.call_info.execution_resources
+        result = {
+            'n_steps': resources.n_steps,
+            'n_memory_holes': resources.n_memory_holes,
+            'storage_updates': storage_updates,
+            **{builtin: count for builtin, count in sorted(resources.builtin_instance_counter.items())}
+        }
+        self.results[name] = result
+        return self.regressions(name, result)
+
+    def regressions(self, name: str, result: dict) -> list[str]:
+        baseline = self.baseline.get(name)
+        if baseline is None:
+            return []
+        return [
+            f"{resource}: {value} > {baseline.get(resource, 0)} (+{self.threshold:.0%})"
+            for resource, value in result.items()
+            if resource not in UNCHECKED_RESOURCES and value > baseline.get(resource, 0) * (1 + self.threshold)
+        ]
+
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+
+def _save_json(path: str, data: dict):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+@pytest.fixture(scope='session')
+def benchmark(request):
+    # Options are only registered when the benchmarks directory is collected directly
+    report_file = request.config.getoption('benchmark_report', REPORT_FILE)
+    threshold = request.config.getoption('benchmark_threshold', DEFAULT_THRESHOLD)
+    update_baseline = request.config.getoption('update_baseline', False)
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+    recorder = BenchmarkRecorder({} if update_baseline else baseline, threshold)
+    yield recorder
+
+    _save_json(report_file, recorder.results)
+    if update_baseline:
+        # Scenarios left out of the run keep their previous baseline
+        _save_json(BASELINE_FILE, {**baseline, **recorder.results})
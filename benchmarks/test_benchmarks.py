@@ -0,0 +1,114 @@
+import pytest
+
+from nile.utils import str_to_felt, to_uint
+
+from contracts_setup import COLLECTION_OWNER_ADDRESS
+
+
+TOKEN_OWNER_ADDRESS = 0xAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
+OTHER_OWNER_ADDRESS = 0xBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBB
+LICENSEE_ADDRESS = 0xCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+ROYALTY_RECEIVER_ADDRESS = 0xDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDD
+
+PARENT_COUNTS = [0, 1, 4, 16]
+DERIVATION_DEPTHS = [0, 1, 4, 16]
+LICENSEE_COUNTS = [1, 16, 64]
+ROYALTY_COUNTS = [0, 1, 8]
+
+
+@pytest.fixture
+def token_contract(contracts_factory):
+    _, token_contract = contracts_factory
+    return token_contract
+
+
+async def mint_chain(token_contract, length: int) -> list:
+    """Mints a chain of tokens, each derived from the previous one."""
+    token_ids = [to_uint(100 + i) for i in range(length)]
+    tokens = [(token_contract.contract_address, token_id) for token_id in token_ids]
+    if length:
+        await token_contract.mintBatch(
+            [TOKEN_OWNER_ADDRESS] * length,
+            token_ids,
+            [0] + [1] * (length - 1),
+            tokens[:-1],
+            [0] * length,
+            []
+        ).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    return tokens
+
+
+async def mint_roots(token_contract, count: int) -> list:
+    """Mints tokens with no parents."""
+    token_ids = [to_uint(200 + i) for i in range(count)]
+    if count:
+        await token_contract.mintBatch(
+            [TOKEN_OWNER_ADDRESS] * count, token_ids, [0] * count, [], [0] * count, []
+        ).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    return [(token_contract.contract_address, token_id) for token_id in token_ids]
+
+
+def assert_no_regressions(name: str, regressions: list[str]):
+    if regressions:
+        pytest.fail(f"{name} regressed: {'; '.join(regressions)}")
+
+
+@pytest.mark.parametrize('parent_count', PARENT_COUNTS)
+async def test_mint(token_contract, benchmark, parent_count):
+    parent_tokens = await mint_roots(token_contract, parent_count)
+
+    name = f"mint[parents={parent_count}]"
+    regressions = await benchmark.measure(
+        name,
+        token_contract.mint(TOKEN_OWNER_ADDRESS, to_uint(1), parent_tokens, [str_to_felt('<CID>')]),
+        caller_address=COLLECTION_OWNER_ADDRESS,
+        execute=True
+    )
+    assert_no_regressions(name, regressions)
+
+
+@pytest.mark.parametrize('depth', DERIVATION_DEPTHS)
+async def test_transferFrom(token_contract, benchmark, depth):
+    tokens = await mint_chain(token_contract, depth + 1)
+
+    name = f"transferFrom[depth={depth}]"
+    regressions = await benchmark.measure(
+        name,
+        token_contract.transferFrom(TOKEN_OWNER_ADDRESS, OTHER_OWNER_ADDRESS, tokens[-1][1]),
+        caller_address=TOKEN_OWNER_ADDRESS,
+        execute=True
+    )
+    assert_no_regressions(name, regressions)
+
+
+@pytest.mark.parametrize('licensee_count', LICENSEE_COUNTS)
+async def test_allowToMint(token_contract, benchmark, licensee_count):
+    token, = await mint_roots(token_contract, 1)
+    licensees = [LICENSEE_ADDRESS + i for i in range(licensee_count)]
+    await token_contract.setTokenArraySettings(
+        token[1], str_to_felt('licensees'), licensees
+    ).execute(caller_address=TOKEN_OWNER_ADDRESS)
+
+    for case, to in (('licensed', licensees[-1]), ('unlicensed', OTHER_OWNER_ADDRESS)):
+        name = f"allowToMint[licensees={licensee_count},{case}]"
+        regressions = await benchmark.measure(name, token_contract.allowToMint(token[1], to))
+        assert_no_regressions(name, regressions)
+
+
+@pytest.mark.parametrize('royalty_count', ROYALTY_COUNTS)
+async def test_royalties(token_contract, benchmark, royalty_count):
+    token, = await mint_roots(token_contract, 1)
+    royalties = [value for i in range(royalty_count) for value in (ROYALTY_RECEIVER_ADDRESS + i, 100)]
+    await token_contract.setCollectionArraySettings(
+        str_to_felt('royalties'), royalties
+    ).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.setTokenArraySettings(
+        token[1], str_to_felt('royalties'), royalties
+    ).execute(caller_address=TOKEN_OWNER_ADDRESS)
+    await token_contract.setAuthorArraySettings(
+        token[1], str_to_felt('royalties'), royalties
+    ).execute(caller_address=TOKEN_OWNER_ADDRESS)
+
+    name = f"royalties[per_level={royalty_count}]"
+    regressions = await benchmark.measure(name, token_contract.royalties(token[1]))
+    assert_no_regressions(name, regressions)
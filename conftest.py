@@ -0,0 +1,132 @@
+import hashlib
+import os
+import pytest
+from importlib.metadata import version
+
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.services.api.contract_class import ContractClass
+from starkware.starknet.testing.starknet import Starknet, StarknetContract
+from starkware.starknet.testing.state import StarknetState
+
+from contracts_setup import (
+    COLLECTION_OWNER_ADDRESS,
+    INITIALIZER_SELECTOR,
+    NAME,
+    PROXY_ADMIN_ADDRESS,
+    PROXY_FILE,
+    REGISTRY_FILE,
+    SYMBOL,
+    TOKEN_FILE
+)
+
+
+CONTRACTS_DIR = 'contracts'
+
+# Compiled classes depend on these besides the contract sources
+COMPILER_PACKAGES = ('cairo-lang', 'openzeppelin-cairo-contracts')
+
+
+def _sources_digest() -> str:
+    # Any change to any contract invalidates every class, which is simpler
+    # than tracking imports and costs one recompilation per change
+    digest = hashlib.sha256()
+    for package in COMPILER_PACKAGES:
+        digest.update(f"{package}=={version(package)}\n".encode())
+    for dirpath, dirnames, filenames in os.walk(CONTRACTS_DIR):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.cairo'):
+                path = os.path.join(dirpath, filename)
+                digest.update(path.encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class ContractClassCache:
+    """Compiled contract classes stored in the pytest cache directory,
+    keyed by a digest of the contract sources, so that they are compiled
+    once across sessions and worker processes."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.digest = _sources_digest()
+        self._classes: dict[str, ContractClass] = {}
+
+    def get(self, source: str) -> ContractClass:
+        if source in self._classes:
+            return self._classes[source]
+
+        name = os.path.splitext(os.path.basename(source))[0]
+        cache_file = os.path.join(self.cache_dir, f"{name}-{self.digest}.json")
+        if os.path.exists(cache_file):
+            with open(cache_file) as f:
+                contract_class = ContractClass.loads(f.read())
+        else:
+            contract_class = compile_starknet_files(files=[source], debug_info=True)
+            # Written aside and renamed, as other workers may read it meanwhile
+            tmp_file = f"{cache_file}.{os.getpid()}"
+            with open(tmp_file, 'w') as f:
+                f.write(contract_class.dumps())
+            os.replace(tmp_file, cache_file)
+        self._classes[source] = contract_class
+        return contract_class
+
+
+@pytest.fixture(scope='session')
+def contract_classes(request):
+    return ContractClassCache(str(request.config.cache.mkdir('contract_classes')))
+
+
+def snapshot_contracts(state: StarknetState, *contracts: StarknetContract) -> tuple[StarknetContract, ...]:
+    """Binds the contracts to a cached state layered over the given one,
+    which reads through to it instead of deep-copying it and keeps the
+    writes to itself."""
+    snapshot = StarknetState(state=state.state._copy(), general_config=state.general_config)
+    return tuple(
+        StarknetContract(snapshot, contract.abi, contract.contract_address, contract.deploy_call_info)
+        for contract in contracts
+    )
+
+
+@pytest.fixture(scope='module')
+async def contracts_init(contract_classes):
+    starknet = await Starknet.empty()
+    proxy_class = contract_classes.get(PROXY_FILE)
+
+    registry_class = await starknet.declare(contract_class=contract_classes.get(REGISTRY_FILE))
+    token_class = await starknet.declare(contract_class=contract_classes.get(TOKEN_FILE))
+
+    registry_contract = await starknet.deploy(
+        contract_class=proxy_class,
+        constructor_calldata=[
+            registry_class.class_hash,
+            INITIALIZER_SELECTOR,
+            1,
+            PROXY_ADMIN_ADDRESS
+        ]
+    )
+    registry_contract = registry_contract.replace_abi(registry_class.abi)
+
+    token_contract = await starknet.deploy(
+        contract_class=proxy_class,
+        constructor_calldata=[
+            token_class.class_hash,
+            INITIALIZER_SELECTOR,
+            5,
+            PROXY_ADMIN_ADDRESS,
+            NAME,
+            SYMBOL,
+            COLLECTION_OWNER_ADDRESS,
+            registry_contract.contract_address
+        ]
+    )
+    token_contract = token_contract.replace_abi(token_class.abi)
+
+    return starknet.state, registry_contract, token_contract
+
+
+@pytest.fixture
+def contracts_factory(contracts_init):
+    state, registry_contract, token_contract = contracts_init
+    return snapshot_contracts(state, registry_contract, token_contract)
@@ -2,6 +2,8 @@
 
 %lang starknet
 
+from starkware.cairo.common.alloc import alloc
+from starkware.cairo.common.bool import TRUE, FALSE
 from starkware.cairo.common.cairo_builtins import HashBuiltin
 from starkware.cairo.common.math import assert_not_zero
 from starkware.starknet.common.syscalls import get_caller_address
@@ -9,12 +11,13 @@ from starkware.starknet.common.syscalls import get_caller_address
 from openzeppelin.upgrades.library import Proxy
 
 from contracts.registry.interface import IOwner
+from contracts.token.interface import IDerivativeToken
 
 //
 // Constants
 //
 
-const VERSION = 3;
+const VERSION = 4;
 
 //
 // Events
@@ -32,6 +35,10 @@ func PrimaryTokenAddressChanged(secondaryAddr: felt, previousPrimaryAddr: felt,
 func TokenRegistry_primary_token_addr(secondary_addr: felt) -> (primary_addr: felt) {
 }
 
+@storage_var
+func TokenRegistry_callback_enabled(secondary_addr: felt) -> (enabled: felt) {
+}
+
 //
 // Initializer
 //
@@ -84,6 +91,30 @@ func getPrimaryTokenAddress{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, rang
     return (primaryAddr=primaryAddr);
 }
 
+@view
+func getPrimaryTokenAddresses{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        secondaryAddrs_len: felt,
+        secondaryAddrs: felt*
+) -> (
+        primaryAddrs_len: felt,
+        primaryAddrs: felt*
+) {
+    alloc_locals;
+    let (local primaryAddrs: felt*) = alloc();
+    _get_primary_token_addresses(secondaryAddrs_len, secondaryAddrs, primaryAddrs);
+    return (primaryAddrs_len=secondaryAddrs_len, primaryAddrs=primaryAddrs);
+}
+
+@view
+func isPrimaryTokenCallbackEnabled{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        secondaryAddr: felt
+) -> (
+        enabled: felt
+) {
+    let (enabled) = TokenRegistry_callback_enabled.read(secondaryAddr);
+    return (enabled=enabled);
+}
+
 @view
 func getProxyAdmin{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
 ) -> (
@@ -102,13 +133,41 @@ func setPrimaryTokenAddress{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, rang
         secondaryAddr: felt,
         newPrimaryAddr: felt
 ) {
-    with_attr error_message("TokenRegistry: secondaryAddr is the zero address") {
-        assert_not_zero(secondaryAddr);
+    _set_primary_token_address(secondaryAddr, newPrimaryAddr);
+    return ();
+}
+
+@external
+func setPrimaryTokenAddresses{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        secondaryAddrs_len: felt,
+        secondaryAddrs: felt*,
+        newPrimaryAddrs_len: felt,
+        newPrimaryAddrs: felt*
+) {
+    with_attr error_message("TokenRegistry: array lengths mismatch") {
+        assert newPrimaryAddrs_len = secondaryAddrs_len;
     }
-    assert_only_contract_owner(secondaryAddr);
-    let (previousPrimaryAddr) = TokenRegistry_primary_token_addr.read(secondaryAddr);
-    TokenRegistry_primary_token_addr.write(secondaryAddr, newPrimaryAddr);
-    PrimaryTokenAddressChanged.emit(secondaryAddr, previousPrimaryAddr, newPrimaryAddr);
+    _set_primary_token_addresses(secondaryAddrs_len, secondaryAddrs, newPrimaryAddrs);
+    return ();
+}
+
+// Called by a secondary token to have its primary token address pushed to it on every change
+@external
+func enablePrimaryTokenCallback{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+) -> (
+        primaryAddr: felt
+) {
+    let (caller) = get_caller_address();
+    TokenRegistry_callback_enabled.write(caller, TRUE);
+    let (primaryAddr) = TokenRegistry_primary_token_addr.read(caller);
+    return (primaryAddr=primaryAddr);
+}
+
+@external
+func disablePrimaryTokenCallback{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+) {
+    let (caller) = get_caller_address();
+    TokenRegistry_callback_enabled.write(caller, FALSE);
     return ();
 }
 
@@ -129,3 +188,66 @@ func setProxyAdmin{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_p
     Proxy._set_admin(newAdmin);
     return ();
 }
+
+//
+// Private
+//
+
+func _set_primary_token_address{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        secondary_addr: felt,
+        new_primary_addr: felt
+) {
+    alloc_locals;
+    with_attr error_message("TokenRegistry: secondaryAddr is the zero address") {
+        assert_not_zero(secondary_addr);
+    }
+    assert_only_contract_owner(secondary_addr);
+    let (local previous_primary_addr) = TokenRegistry_primary_token_addr.read(secondary_addr);
+    TokenRegistry_primary_token_addr.write(secondary_addr, new_primary_addr);
+    // Only secondaries that opted in are called, so any other Ownable contract can still be registered
+    let (callback_enabled) = TokenRegistry_callback_enabled.read(secondary_addr);
+    if (callback_enabled == TRUE) {
+        IDerivativeToken.onPrimaryTokenAddressChanged(secondary_addr, new_primary_addr);
+        tempvar syscall_ptr = syscall_ptr;
+        tempvar pedersen_ptr = pedersen_ptr;
+        tempvar range_check_ptr = range_check_ptr;
+    } else {
+        tempvar syscall_ptr = syscall_ptr;
+        tempvar pedersen_ptr = pedersen_ptr;
+        tempvar range_check_ptr = range_check_ptr;
+    }
+    PrimaryTokenAddressChanged.emit(secondary_addr, previous_primary_addr, new_primary_addr);
+    return ();
+}
+
+func _set_primary_token_addresses{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        secondary_addrs_index: felt,
+        secondary_addrs_ptr: felt*,
+        new_primary_addrs_ptr: felt*
+) {
+    if (secondary_addrs_index == 0) {
+        return ();
+    }
+
+    _set_primary_token_address([secondary_addrs_ptr], [new_primary_addrs_ptr]);
+    _set_primary_token_addresses(secondary_addrs_index - 1, secondary_addrs_ptr + 1, new_primary_addrs_ptr + 1);
+    return ();
+}
+
+func _get_primary_token_addresses{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        secondary_addrs_index: felt,
+        secondary_addrs_ptr: felt*,
+        primary_addrs_ptr: felt*
+) {
+    if (secondary_addrs_index == 0) {
+        return ();
+    }
+
+    with_attr error_message("TokenRegistry: secondaryAddr is the zero address") {
+        assert_not_zero([secondary_addrs_ptr]);
+    }
+    let (primary_addr) = TokenRegistry_primary_token_addr.read([secondary_addrs_ptr]);
+    assert [primary_addrs_ptr] = primary_addr;
+    _get_primary_token_addresses(secondary_addrs_index - 1, secondary_addrs_ptr + 1, primary_addrs_ptr + 1);
+    return ();
+}
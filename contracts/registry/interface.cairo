@@ -19,9 +19,24 @@ namespace ITokenRegistry {
     func getPrimaryTokenAddress(secondaryAddr: felt) -> (primaryAddr: felt) {
     }
 
+//  func getPrimaryTokenAddresses(secondaryAddrs_len: felt, secondaryAddrs: felt*) -> (primaryAddrs_len: felt, primaryAddrs: felt*) {
+//  }
+
 //  func setPrimaryTokenAddress(secondaryAddr: felt, newPrimaryAddr: felt) {
 //  }
 
+//  func setPrimaryTokenAddresses(secondaryAddrs_len: felt, secondaryAddrs: felt*, newPrimaryAddrs_len: felt, newPrimaryAddrs: felt*) {
+//  }
+
+//  func isPrimaryTokenCallbackEnabled(secondaryAddr: felt) -> (enabled: felt) {
+//  }
+
+    func enablePrimaryTokenCallback() -> (primaryAddr: felt) {
+    }
+
+    func disablePrimaryTokenCallback() {
+    }
+
 //
 //  Upgrade
 //
@@ -5,9 +5,14 @@
 from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.bool import TRUE, FALSE
 from starkware.cairo.common.cairo_builtins import HashBuiltin
-from starkware.cairo.common.math import assert_not_zero, assert_not_equal
+from starkware.cairo.common.default_dict import default_dict_new, default_dict_finalize
+from starkware.cairo.common.dict import dict_read, dict_write
+from starkware.cairo.common.dict_access import DictAccess
+from starkware.cairo.common.hash import hash2
+from starkware.cairo.common.math import assert_nn, assert_not_zero, assert_not_equal
+from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.uint256 import Uint256, uint256_check
-from starkware.starknet.common.syscalls import get_caller_address, get_contract_address
+from starkware.starknet.common.syscalls import get_caller_address
 
 from openzeppelin.access.accesscontrol.library import AccessControl
 from openzeppelin.access.ownable.library import Ownable
@@ -17,7 +22,6 @@ from openzeppelin.upgrades.library import Proxy
 
 from contracts.common.royalty import Royalty
 from contracts.common.token import Token
-from contracts.registry.interface import ITokenRegistry
 from contracts.token.interface import IDerivativeToken
 from contracts.token.metadata.authorable import Authorable
 from contracts.token.metadata.derivable import Derivable
@@ -30,11 +34,14 @@ from contracts.token.upgrades.registry import RegistryProxy
 // Constants
 //
 
-const VERSION = 5;
+const VERSION = 6;
 
 const OWNER_ROLE = 'owner';
 const ADMIN_ROLE = 'admin';
 
+// Bound on the distinct ancestor tokens checked for a transfer
+const MAX_ANCESTOR_VISITS = 64;
+
 //
 // Initializer
 //
@@ -184,6 +191,25 @@ func tokenURI{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
     return (tokenURI_len=tokenURI_len, tokenURI=tokenURI);
 }
 
+@view
+func baseURI{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+) -> (
+        baseURI_len: felt,
+        baseURI: felt*
+) {
+    let (baseURI_len, baseURI) = ERC721Ext.base_uri();
+    return (baseURI_len=baseURI_len, baseURI=baseURI);
+}
+
+@view
+func tokenIdSuffix{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+) -> (
+        res: felt
+) {
+    let (res) = ERC721Ext.token_id_suffix();
+    return (res=res);
+}
+
 @view
 func authorOf{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         tokenId: Uint256
@@ -298,6 +324,25 @@ func allowTransferring{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_che
     return (allowed=allowed);
 }
 
+// Allows checking a token and reaching its parents in a single call
+@view
+func transferLicense{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenId: Uint256
+) -> (
+        allowed: felt,
+        parentTokens_len: felt,
+        parentTokens: Token*
+) {
+    alloc_locals;
+    let exists = ERC721._exists(tokenId);
+    with_attr error_message("DerivativeToken: query for nonexistent token") {
+        assert exists = TRUE;
+    }
+    let (local allowed) = DerivativeLicense.allow_to_transfer(tokenId);
+    let (parentTokens_len, parentTokens) = Derivable.parent_tokens_of(tokenId);
+    return (allowed=allowed, parentTokens_len=parentTokens_len, parentTokens=parentTokens);
+}
+
 @view
 func allowToMint{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         tokenId: Uint256,
@@ -329,6 +374,25 @@ func royalties{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
     return (royalties_len=royalties_len, royalties=royalties);
 }
 
+// The royalties of all the tokens are concatenated,
+// with royaltiesLens holding the number of royalties for each token
+@view
+func royaltiesOf{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenIds_len: felt,
+        tokenIds: Uint256*
+) -> (
+        royaltiesLens_len: felt,
+        royaltiesLens: felt*,
+        royalties_len: felt,
+        royalties: Royalty*
+) {
+    with_attr error_message("DerivativeToken: query for nonexistent token") {
+        _assert_tokens_exist(tokenIds_len, tokenIds);
+    }
+    let (royaltiesLens, royalties_len, royalties) = DerivativeLicense.royalties_of(tokenIds_len, tokenIds);
+    return (royaltiesLens_len=tokenIds_len, royaltiesLens=royaltiesLens, royalties_len=royalties_len, royalties=royalties);
+}
+
 @view
 func isDragAlong{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         tokenId: Uint256
@@ -575,6 +639,45 @@ func mint{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
     return ();
 }
 
+// The parent tokens and token URIs of all the tokens are concatenated,
+// with parentTokensLens and tokenURILens holding the length for each token
+@external
+func mintBatch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        to_len: felt,
+        to: felt*,
+        tokenIds_len: felt,
+        tokenIds: Uint256*,
+        parentTokensLens_len: felt,
+        parentTokensLens: felt*,
+        parentTokens_len: felt,
+        parentTokens: Token*,
+        tokenURILens_len: felt,
+        tokenURILens: felt*,
+        tokenURIs_len: felt,
+        tokenURIs: felt*
+) {
+    alloc_locals;
+    assert_only_owner_or_admin();
+    with_attr error_message("DerivativeToken: array lengths mismatch") {
+        assert tokenIds_len = to_len;
+        assert parentTokensLens_len = to_len;
+        assert tokenURILens_len = to_len;
+        let total_parent_tokens_len = _sum(parentTokensLens_len, parentTokensLens);
+        assert total_parent_tokens_len = parentTokens_len;
+        let total_token_uris_len = _sum(tokenURILens_len, tokenURILens);
+        assert total_token_uris_len = tokenURIs_len;
+    }
+
+    // Licensing queries already answered within the batch
+    let (local licensed_start) = default_dict_new(default_value=FALSE);
+    let licensed = licensed_start;
+    with licensed {
+        _mint_batch(to_len, to, tokenIds, parentTokensLens, parentTokens, tokenURILens, tokenURIs);
+    }
+    default_dict_finalize(licensed_start, licensed, FALSE);
+    return ();
+}
+
 @external
 func setTokenURI{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         tokenId: Uint256,
@@ -590,6 +693,25 @@ func setTokenURI{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr
     return ();
 }
 
+@external
+func setBaseURI{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        baseURI_len: felt,
+        baseURI: felt*
+) {
+    assert_only_owner_or_admin();
+    ERC721Ext.set_base_uri(baseURI_len, baseURI);
+    return ();
+}
+
+@external
+func setTokenIdSuffix{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        value: felt
+) {
+    assert_only_owner_or_admin();
+    ERC721Ext.set_token_id_suffix(value);
+    return ();
+}
+
 @external
 func setAuthor{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         tokenId: Uint256,
@@ -620,6 +742,37 @@ func setParentTokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check
     return ();
 }
 
+@external
+func addParentTokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenId: Uint256,
+        parentTokens_len: felt,
+        parentTokens: Token*
+) {
+    assert_only_owner_or_admin();
+    let (owner) = ERC721.owner_of(tokenId);
+    let allowed = _allow_minting(owner, parentTokens_len, parentTokens);
+    with_attr error_message("DerivativeToken: not licensed by parent tokens") {
+        assert allowed = TRUE;
+    }
+    Derivable.add_parent_tokens(tokenId, parentTokens_len, parentTokens);
+    return ();
+}
+
+@external
+func removeParentTokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenId: Uint256,
+        parentTokens_len: felt,
+        parentTokens: Token*
+) {
+    assert_only_owner_or_admin();
+    let exists = ERC721._exists(tokenId);
+    with_attr error_message("DerivativeToken: remove parent tokens for nonexistent token") {
+        assert exists = TRUE;
+    }
+    Derivable.remove_parent_tokens(tokenId, parentTokens_len, parentTokens);
+    return ();
+}
+
 @external
 func setCollectionSettings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         key: felt,
@@ -642,6 +795,24 @@ func setCollectionArraySettings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*,
     return ();
 }
 
+@external
+func addCollectionLicensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        licensee: felt
+) {
+    Ownable.assert_only_owner();
+    DerivativeLicense.add_collection_licensee(licensee);
+    return ();
+}
+
+@external
+func removeCollectionLicensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        licensee: felt
+) {
+    Ownable.assert_only_owner();
+    DerivativeLicense.remove_collection_licensee(licensee);
+    return ();
+}
+
 @external
 func setTokenSettings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         tokenId: Uint256,
@@ -674,6 +845,72 @@ func setTokenArraySettings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range
     return ();
 }
 
+// Sets the same value for all the tokens if values_len is 1, or one value per token otherwise
+@external
+func setTokenSettingsBatch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenIds_len: felt,
+        tokenIds: Uint256*,
+        key: felt,
+        values_len: felt,
+        values: felt*
+) {
+    let (caller) = get_caller_address();
+    _assert_only_tokens_owner(caller, tokenIds_len, tokenIds);
+    DerivativeLicense.set_token_settings_batch(tokenIds_len, tokenIds, key, values_len, values);
+    return ();
+}
+
+// Sets the same array for all the tokens if valuesLens_len is 1, or the concatenated
+// arrays of all the tokens otherwise, with valuesLens holding the length for each token
+@external
+func setTokenArraySettingsBatch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenIds_len: felt,
+        tokenIds: Uint256*,
+        key: felt,
+        valuesLens_len: felt,
+        valuesLens: felt*,
+        values_len: felt,
+        values: felt*
+) {
+    alloc_locals;
+    let (caller) = get_caller_address();
+    _assert_only_tokens_owner(caller, tokenIds_len, tokenIds);
+    with_attr error_message("DerivativeToken: array lengths mismatch") {
+        let total_values_len = _sum(valuesLens_len, valuesLens);
+        assert total_values_len = values_len;
+    }
+    DerivativeLicense.set_token_array_settings_batch(tokenIds_len, tokenIds, key, valuesLens_len, valuesLens, values);
+    return ();
+}
+
+@external
+func addTokenLicensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenId: Uint256,
+        licensee: felt
+) {
+    ERC721.assert_only_token_owner(tokenId);
+    let exists = ERC721._exists(tokenId);
+    with_attr error_message("DerivativeToken: set for nonexistent token") {
+        assert exists = TRUE;
+    }
+    DerivativeLicense.add_token_licensee(tokenId, licensee);
+    return ();
+}
+
+@external
+func removeTokenLicensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenId: Uint256,
+        licensee: felt
+) {
+    ERC721.assert_only_token_owner(tokenId);
+    let exists = ERC721._exists(tokenId);
+    with_attr error_message("DerivativeToken: set for nonexistent token") {
+        assert exists = TRUE;
+    }
+    DerivativeLicense.remove_token_licensee(tokenId, licensee);
+    return ();
+}
+
 @external
 func setAuthorSettings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         tokenId: Uint256,
@@ -706,6 +943,28 @@ func setAuthorArraySettings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, rang
     return ();
 }
 
+// Same layout as setTokenArraySettingsBatch
+@external
+func setAuthorArraySettingsBatch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        tokenIds_len: felt,
+        tokenIds: Uint256*,
+        key: felt,
+        valuesLens_len: felt,
+        valuesLens: felt*,
+        values_len: felt,
+        values: felt*
+) {
+    alloc_locals;
+    let (caller) = get_caller_address();
+    _assert_only_tokens_author(caller, tokenIds_len, tokenIds);
+    with_attr error_message("DerivativeToken: array lengths mismatch") {
+        let total_values_len = _sum(valuesLens_len, valuesLens);
+        assert total_values_len = values_len;
+    }
+    DerivativeLicense.set_author_array_settings_batch(tokenIds_len, tokenIds, key, valuesLens_len, valuesLens, values);
+    return ();
+}
+
 @external
 func transferOwnership{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         newOwner: felt
@@ -768,6 +1027,24 @@ func setProxyAdmin{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_p
     return ();
 }
 
+// Pushed by the registry on every change of the primary token address once syncPrimaryTokenAddress has been called
+@external
+func onPrimaryTokenAddressChanged{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        newPrimaryAddr: felt
+) {
+    RegistryProxy.assert_only_registry();
+    RegistryProxy._set_primary_token_address(newPrimaryAddr);
+    return ();
+}
+
+// Caches the primary token address and enables the registry to push its later changes
+@external
+func syncPrimaryTokenAddress{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+) {
+    RegistryProxy.sync_primary_token_address();
+    return ();
+}
+
 //
 // Internals
 //
@@ -817,45 +1094,195 @@ func _is_author_of{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_p
 
 func _is_secondary_token{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
 ) -> felt {
-    let (registry) = RegistryProxy.registry();
-    let (contract) = get_contract_address();
-    let (result) = ITokenRegistry.getPrimaryTokenAddress(registry, contract);
-    if (result == 0) {
-        return FALSE;
-    } else {
-        return TRUE;
-    }
+    let res = RegistryProxy.is_secondary_token();
+    return res;
 }
 
 func _allow_transferring{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        parent_tokens_len: felt,
+        parent_tokens: Token*
+) -> felt {
+    alloc_locals;
+    // Ancestors are visited breadth first, each at most once however many paths lead to it
+    let (local queue: Token*) = alloc();
+    memcpy(queue, parent_tokens, parent_tokens_len * Token.SIZE);
+    let (local visited_start) = default_dict_new(default_value=FALSE);
+    let visited = visited_start;
+    with visited {
+        let allowed = _visit_ancestors(queue, 0, parent_tokens_len, 0);
+    }
+    default_dict_finalize(visited_start, visited, FALSE);
+    return allowed;
+}
+
+func _allow_minting{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        to: felt,
         parent_tokens_index: felt,
         parent_tokens_ptr: Token*
 ) -> felt {
     if (parent_tokens_index == 0) {
         return TRUE;
     }
-    let (allowed) = IDerivativeToken.allowToTransfer(parent_tokens_ptr.collection, parent_tokens_ptr.id);
+    let (allowed) = IDerivativeToken.allowToMint(parent_tokens_ptr.collection, parent_tokens_ptr.id, to);
     if (allowed == FALSE) {
         return FALSE;
     }
-    let (allowed) = IDerivativeToken.allowTransferring(parent_tokens_ptr.collection, parent_tokens_ptr.id);
-    if (allowed == FALSE) {
-        return FALSE;
+    return _allow_minting(to, parent_tokens_index - 1, parent_tokens_ptr + Token.SIZE);
+}
+
+func _mint_batch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, licensed: DictAccess*}(
+        index: felt,
+        to_ptr: felt*,
+        token_ids_ptr: Uint256*,
+        parent_tokens_lens_ptr: felt*,
+        parent_tokens_ptr: Token*,
+        token_uri_lens_ptr: felt*,
+        token_uris_ptr: felt*
+) {
+    alloc_locals;
+    if (index == 0) {
+        return ();
     }
-    return _allow_transferring(parent_tokens_index - 1, parent_tokens_ptr + Token.SIZE);
+
+    let allowed = _allow_minting_once([to_ptr], [parent_tokens_lens_ptr], parent_tokens_ptr);
+    with_attr error_message("DerivativeToken: not licensed by parent tokens") {
+        assert allowed = TRUE;
+    }
+    ERC721._mint([to_ptr], [token_ids_ptr]);
+    Authorable.set_author([token_ids_ptr], [to_ptr]);
+    Derivable.set_parent_tokens([token_ids_ptr], [parent_tokens_lens_ptr], parent_tokens_ptr);
+    ERC721Ext.set_token_uri([token_ids_ptr], [token_uri_lens_ptr], token_uris_ptr);
+    return _mint_batch(
+            index - 1,
+            to_ptr + 1,
+            token_ids_ptr + Uint256.SIZE,
+            parent_tokens_lens_ptr + 1,
+            parent_tokens_ptr + [parent_tokens_lens_ptr] * Token.SIZE,
+            token_uri_lens_ptr + 1,
+            token_uris_ptr + [token_uri_lens_ptr]
+    );
 }
 
-func _allow_minting{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+func _allow_minting_once{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, licensed: DictAccess*}(
         to: felt,
         parent_tokens_index: felt,
         parent_tokens_ptr: Token*
 ) -> felt {
+    alloc_locals;
     if (parent_tokens_index == 0) {
         return TRUE;
     }
+    let token_key = _token_key(parent_tokens_ptr);
+    let (local key) = hash2{hash_ptr=pedersen_ptr}(token_key, to);
+    let (cached) = dict_read{dict_ptr=licensed}(key);
+    if (cached == TRUE) {
+        return _allow_minting_once(to, parent_tokens_index - 1, parent_tokens_ptr + Token.SIZE);
+    }
     let (allowed) = IDerivativeToken.allowToMint(parent_tokens_ptr.collection, parent_tokens_ptr.id, to);
     if (allowed == FALSE) {
         return FALSE;
     }
-    return _allow_minting(to, parent_tokens_index - 1, parent_tokens_ptr + Token.SIZE);
+    dict_write{dict_ptr=licensed}(key, TRUE);
+    return _allow_minting_once(to, parent_tokens_index - 1, parent_tokens_ptr + Token.SIZE);
+}
+
+func _sum{range_check_ptr}(
+        values_index: felt,
+        values_ptr: felt*
+) -> felt {
+    if (values_index == 0) {
+        return 0;
+    }
+    assert_nn([values_ptr]);
+    let rest = _sum(values_index - 1, values_ptr + 1);
+    return [values_ptr] + rest;
+}
+
+// The owner lookup also rejects nonexistent tokens
+func _assert_only_tokens_owner{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        caller: felt,
+        token_ids_index: felt,
+        token_ids_ptr: Uint256*
+) {
+    if (token_ids_index == 0) {
+        return ();
+    }
+    let (owner) = ERC721.owner_of([token_ids_ptr]);
+    with_attr error_message("DerivativeToken: caller is not token owner") {
+        assert caller = owner;
+    }
+    _assert_only_tokens_owner(caller, token_ids_index - 1, token_ids_ptr + Uint256.SIZE);
+    return ();
+}
+
+func _assert_only_tokens_author{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        caller: felt,
+        token_ids_index: felt,
+        token_ids_ptr: Uint256*
+) {
+    alloc_locals;
+    if (token_ids_index == 0) {
+        return ();
+    }
+    let exists = ERC721._exists([token_ids_ptr]);
+    with_attr error_message("DerivativeToken: set for nonexistent token") {
+        assert exists = TRUE;
+    }
+    let authorized = _is_author_of(caller, [token_ids_ptr]);
+    with_attr error_message("DerivativeToken: caller is not token author") {
+        assert authorized = TRUE;
+    }
+    _assert_only_tokens_author(caller, token_ids_index - 1, token_ids_ptr + Uint256.SIZE);
+    return ();
+}
+
+func _assert_tokens_exist{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_ids_index: felt,
+        token_ids_ptr: Uint256*
+) {
+    if (token_ids_index == 0) {
+        return ();
+    }
+    let exists = ERC721._exists([token_ids_ptr]);
+    assert exists = TRUE;
+    _assert_tokens_exist(token_ids_index - 1, token_ids_ptr + Uint256.SIZE);
+    return ();
+}
+
+func _visit_ancestors{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr, visited: DictAccess*}(
+        queue: Token*,
+        head: felt,
+        tail: felt,
+        visits: felt
+) -> felt {
+    alloc_locals;
+    if (head == tail) {
+        return TRUE;
+    }
+
+    let token_ptr = queue + head * Token.SIZE;
+    let token_key = _token_key(token_ptr);
+    local key = token_key;
+    let (seen) = dict_read{dict_ptr=visited}(key);
+    if (seen == TRUE) {
+        return _visit_ancestors(queue, head + 1, tail, visits);
+    }
+    with_attr error_message("DerivativeToken: too many ancestor tokens to check") {
+        assert_not_equal(visits, MAX_ANCESTOR_VISITS);
+    }
+    dict_write{dict_ptr=visited}(key, TRUE);
+    let (allowed, parent_tokens_len, parent_tokens) = IDerivativeToken.transferLicense(token_ptr.collection, token_ptr.id);
+    if (allowed == FALSE) {
+        return FALSE;
+    }
+    memcpy(queue + tail * Token.SIZE, parent_tokens, parent_tokens_len * Token.SIZE);
+    return _visit_ancestors(queue, head + 1, tail + parent_tokens_len, visits + 1);
+}
+
+func _token_key{pedersen_ptr: HashBuiltin*}(
+        token_ptr: Token*
+) -> felt {
+    let (key) = hash2{hash_ptr=pedersen_ptr}(token_ptr.collection, token_ptr.id.low);
+    let (key) = hash2{hash_ptr=pedersen_ptr}(key, token_ptr.id.high);
+    return key;
 }
@@ -4,6 +4,8 @@
 
 from starkware.cairo.common.uint256 import Uint256
 
+from contracts.common.token import Token
+
 @contract_interface
 namespace IDerivativeToken {
 
@@ -34,6 +36,12 @@ namespace IDerivativeToken {
 //  func tokenURI(tokenId: Uint256) -> (tokenURI_len: felt, tokenURI: felt*) {
 //  }
 
+//  func baseURI() -> (baseURI_len: felt, baseURI: felt*) {
+//  }
+
+//  func tokenIdSuffix() -> (res: felt) {
+//  }
+
 //  func balanceOf(owner: felt) -> (balance: Uint256) {
 //  }
 
@@ -61,9 +69,18 @@ namespace IDerivativeToken {
 //  func mint(to: felt, tokenId: Uint256, parentTokens_len: felt, parentTokens: Token*, tokenURI_len: felt, tokenURI: felt*) {
 //  }
 
+//  func mintBatch(to_len: felt, to: felt*, tokenIds_len: felt, tokenIds: Uint256*, parentTokensLens_len: felt, parentTokensLens: felt*, parentTokens_len: felt, parentTokens: Token*, tokenURILens_len: felt, tokenURILens: felt*, tokenURIs_len: felt, tokenURIs: felt*) {
+//  }
+
 //  func setTokenURI(tokenId: Uint256, tokenURI_len: felt, tokenURI: felt*) {
 //  }
 
+//  func setBaseURI(baseURI_len: felt, baseURI: felt*) {
+//  }
+
+//  func setTokenIdSuffix(value: felt) {
+//  }
+
 //
 //  Metadata
 //
@@ -80,6 +97,12 @@ namespace IDerivativeToken {
 //  func setParentTokens(tokenId: Uint256, parentTokens_len: felt, parentTokens: Token*) {
 //  }
 
+//  func addParentTokens(tokenId: Uint256, parentTokens_len: felt, parentTokens: Token*) {
+//  }
+
+//  func removeParentTokens(tokenId: Uint256, parentTokens_len: felt, parentTokens: Token*) {
+//  }
+
 //  func relationsWith(tokenId: Uint256, otherToken: Token) -> (relations_len: felt, relations: felt*) {
 //  }
 
@@ -96,12 +119,18 @@ namespace IDerivativeToken {
     func allowTransferring(tokenId: Uint256) -> (allowed: felt) {
     }
 
+    func transferLicense(tokenId: Uint256) -> (allowed: felt, parentTokens_len: felt, parentTokens: Token*) {
+    }
+
     func allowToMint(tokenId: Uint256, to: felt) -> (allowed: felt) {
     }
 
 //  func royalties(tokenId: Uint256) -> (royalties_len: felt, royalties: Royalty*) {
 //  }
 
+//  func royaltiesOf(tokenIds_len: felt, tokenIds: Uint256*) -> (royaltiesLens_len: felt, royaltiesLens: felt*, royalties_len: felt, royalties: Royalty*) {
+//  }
+
 //  func isDragAlong(tokenId: Uint256) -> (res: felt) {
 //  }
 
@@ -129,18 +158,39 @@ namespace IDerivativeToken {
 //  func setCollectionArraySettings(key: felt, values_len: felt, values: felt*) {
 //  }
 
+//  func addCollectionLicensee(licensee: felt) {
+//  }
+
+//  func removeCollectionLicensee(licensee: felt) {
+//  }
+
 //  func setTokenSettings(tokenId: Uint256, key: felt, value: felt) {
 //  }
 
 //  func setTokenArraySettings(tokenId: Uint256, key: felt, values_len: felt, values: felt*) {
 //  }
 
+//  func setTokenSettingsBatch(tokenIds_len: felt, tokenIds: Uint256*, key: felt, values_len: felt, values: felt*) {
+//  }
+
+//  func setTokenArraySettingsBatch(tokenIds_len: felt, tokenIds: Uint256*, key: felt, valuesLens_len: felt, valuesLens: felt*, values_len: felt, values: felt*) {
+//  }
+
+//  func addTokenLicensee(tokenId: Uint256, licensee: felt) {
+//  }
+
+//  func removeTokenLicensee(tokenId: Uint256, licensee: felt) {
+//  }
+
 //  func setAuthorSettings(tokenId: Uint256, key: felt, value: felt) {
 //  }
 
 //  func setAuthorArraySettings(tokenId: Uint256, key: felt, values_len: felt, values: felt*) {
 //  }
 
+//  func setAuthorArraySettingsBatch(tokenIds_len: felt, tokenIds: Uint256*, key: felt, valuesLens_len: felt, valuesLens: felt*, values_len: felt, values: felt*) {
+//  }
+
 //
 //  Access
 //
@@ -174,6 +224,12 @@ namespace IDerivativeToken {
 //  }
 
 //  func upgradeRegistry(newRegistry: felt) {
+//  }
+
+    func onPrimaryTokenAddressChanged(newPrimaryAddr: felt) {
+    }
+
+//  func syncPrimaryTokenAddress() {
 //  }
 
 //  func getProxyAdmin() -> (admin: felt) {
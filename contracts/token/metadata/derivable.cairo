@@ -30,6 +30,22 @@ func ChildTokensChanged(
         newChildTokens_len: felt, newChildTokens: Token*) {
 }
 
+@event
+func ParentTokensAdded(tokenId: Uint256, parentTokens_len: felt, parentTokens: Token*) {
+}
+
+@event
+func ParentTokensRemoved(tokenId: Uint256, parentTokens_len: felt, parentTokens: Token*) {
+}
+
+@event
+func ChildTokensAdded(tokenId: Uint256, childTokens_len: felt, childTokens: Token*) {
+}
+
+@event
+func ChildTokensRemoved(tokenId: Uint256, childTokens_len: felt, childTokens: Token*) {
+}
+
 //
 // Storage
 //
@@ -46,6 +62,11 @@ func Derivable_parent_tokens(token_id: Uint256, index: felt) -> (token: Token) {
 func Derivable_is_parent_token(token_id: Uint256, other_token: Token) -> (res: felt) {
 }
 
+// Storage index of each parent token plus one, or zero if absent or set before the index existed
+@storage_var
+func Derivable_parent_token_index(token_id: Uint256, other_token: Token) -> (index: felt) {
+}
+
 @storage_var
 func Derivable_child_tokens_len(token_id: Uint256) -> (len: felt) {
 }
@@ -58,6 +79,11 @@ func Derivable_child_tokens(token_id: Uint256, index: felt) -> (token: Token) {
 func Derivable_is_child_token(token_id: Uint256, other_token: Token) -> (res: felt) {
 }
 
+// Storage index of each child token plus one, or zero if absent or set before the index existed
+@storage_var
+func Derivable_child_token_index(token_id: Uint256, other_token: Token) -> (index: felt) {
+}
+
 namespace Derivable {
 
     //
@@ -178,6 +204,75 @@ namespace Derivable {
         return ();
     }
 
+
+    func add_parent_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_id: Uint256,
+            parent_tokens_len: felt,
+            parent_tokens: Token*
+    ) {
+        alloc_locals;
+        with_attr error_message("Derivable: token_id is not a valid Uint256") {
+            uint256_check(token_id);
+        }
+
+        let (local previous_parent_tokens_len) = Derivable_parent_tokens_len.read(token_id);
+        _add_parent_tokens(token_id, previous_parent_tokens_len, parent_tokens_len, parent_tokens);
+        Derivable_parent_tokens_len.write(token_id, previous_parent_tokens_len + parent_tokens_len);
+        ParentTokensAdded.emit(token_id, parent_tokens_len, parent_tokens);
+        return ();
+    }
+
+    func remove_parent_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_id: Uint256,
+            parent_tokens_len: felt,
+            parent_tokens: Token*
+    ) {
+        alloc_locals;
+        with_attr error_message("Derivable: token_id is not a valid Uint256") {
+            uint256_check(token_id);
+        }
+
+        let (local previous_parent_tokens_len) = Derivable_parent_tokens_len.read(token_id);
+        _remove_parent_tokens(token_id, previous_parent_tokens_len, parent_tokens_len, parent_tokens);
+        Derivable_parent_tokens_len.write(token_id, previous_parent_tokens_len - parent_tokens_len);
+        ParentTokensRemoved.emit(token_id, parent_tokens_len, parent_tokens);
+        return ();
+    }
+
+    func add_child_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_id: Uint256,
+            child_tokens_len: felt,
+            child_tokens: Token*
+    ) {
+        alloc_locals;
+        with_attr error_message("Derivable: token_id is not a valid Uint256") {
+            uint256_check(token_id);
+        }
+
+        let (local previous_child_tokens_len) = Derivable_child_tokens_len.read(token_id);
+        _add_child_tokens(token_id, previous_child_tokens_len, child_tokens_len, child_tokens);
+        Derivable_child_tokens_len.write(token_id, previous_child_tokens_len + child_tokens_len);
+        ChildTokensAdded.emit(token_id, child_tokens_len, child_tokens);
+        return ();
+    }
+
+    func remove_child_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_id: Uint256,
+            child_tokens_len: felt,
+            child_tokens: Token*
+    ) {
+        alloc_locals;
+        with_attr error_message("Derivable: token_id is not a valid Uint256") {
+            uint256_check(token_id);
+        }
+
+        let (local previous_child_tokens_len) = Derivable_child_tokens_len.read(token_id);
+        _remove_child_tokens(token_id, previous_child_tokens_len, child_tokens_len, child_tokens);
+        Derivable_child_tokens_len.write(token_id, previous_child_tokens_len - child_tokens_len);
+        ChildTokensRemoved.emit(token_id, child_tokens_len, child_tokens);
+        return ();
+    }
+
 }
 
 //
@@ -224,6 +319,7 @@ func _clear_is_parent_token{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, rang
     }
 
     Derivable_is_parent_token.write(token_id, [parent_tokens_ptr], FALSE);
+    Derivable_parent_token_index.write(token_id, [parent_tokens_ptr], 0);
     _clear_is_parent_token(token_id, parent_tokens_index - 1, parent_tokens_ptr + Token.SIZE);
     return ();
 }
@@ -238,6 +334,7 @@ func _clear_is_child_token{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range
     }
 
     Derivable_is_child_token.write(token_id, [child_tokens_ptr], FALSE);
+    Derivable_child_token_index.write(token_id, [child_tokens_ptr], 0);
     _clear_is_child_token(token_id, child_tokens_index - 1, child_tokens_ptr + Token.SIZE);
     return ();
 }
@@ -253,6 +350,7 @@ func _set_parent_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_ch
 
     Derivable_parent_tokens.write(token_id, parent_tokens_index - 1, [parent_tokens_ptr]);
     Derivable_is_parent_token.write(token_id, [parent_tokens_ptr], TRUE);
+    Derivable_parent_token_index.write(token_id, [parent_tokens_ptr], parent_tokens_index);
     _set_parent_tokens(token_id, parent_tokens_index - 1, parent_tokens_ptr + Token.SIZE);
     return ();
 }
@@ -268,6 +366,159 @@ func _set_child_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_che
 
     Derivable_child_tokens.write(token_id, child_tokens_index - 1, [child_tokens_ptr]);
     Derivable_is_child_token.write(token_id, [child_tokens_ptr], TRUE);
+    Derivable_child_token_index.write(token_id, [child_tokens_ptr], child_tokens_index);
     _set_child_tokens(token_id, child_tokens_index - 1, child_tokens_ptr + Token.SIZE);
     return ();
 }
+
+func _add_parent_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        parent_tokens_len: felt,
+        index: felt,
+        parent_tokens_ptr: Token*
+) {
+    if (index == 0) {
+        return ();
+    }
+
+    let (exists) = Derivable_is_parent_token.read(token_id, [parent_tokens_ptr]);
+    with_attr error_message("Derivable: already a parent token") {
+        assert exists = FALSE;
+    }
+    Derivable_parent_tokens.write(token_id, parent_tokens_len, [parent_tokens_ptr]);
+    Derivable_is_parent_token.write(token_id, [parent_tokens_ptr], TRUE);
+    Derivable_parent_token_index.write(token_id, [parent_tokens_ptr], parent_tokens_len + 1);
+    _add_parent_tokens(token_id, parent_tokens_len + 1, index - 1, parent_tokens_ptr + Token.SIZE);
+    return ();
+}
+
+// Moves the last parent token into the slot of each removed one
+func _remove_parent_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        parent_tokens_len: felt,
+        index: felt,
+        parent_tokens_ptr: Token*
+) {
+    alloc_locals;
+    if (index == 0) {
+        return ();
+    }
+
+    let slot = _parent_token_slot(token_id, parent_tokens_len, [parent_tokens_ptr]);
+    let (last_token) = Derivable_parent_tokens.read(token_id, parent_tokens_len - 1);
+    Derivable_parent_tokens.write(token_id, slot, last_token);
+    Derivable_parent_token_index.write(token_id, last_token, slot + 1);
+    Derivable_parent_token_index.write(token_id, [parent_tokens_ptr], 0);
+    Derivable_is_parent_token.write(token_id, [parent_tokens_ptr], FALSE);
+    _remove_parent_tokens(token_id, parent_tokens_len - 1, index - 1, parent_tokens_ptr + Token.SIZE);
+    return ();
+}
+
+func _parent_token_slot{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        parent_tokens_len: felt,
+        other_token: Token
+) -> felt {
+    let (index) = Derivable_parent_token_index.read(token_id, other_token);
+    if (index != 0) {
+        return index - 1;
+    }
+    let (exists) = Derivable_is_parent_token.read(token_id, other_token);
+    with_attr error_message("Derivable: not a parent token") {
+        assert exists = TRUE;
+    }
+    let slot = _find_parent_token(token_id, parent_tokens_len, other_token);
+    return slot;
+}
+
+func _find_parent_token{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        index: felt,
+        other_token: Token
+) -> felt {
+    alloc_locals;
+    let (token) = Derivable_parent_tokens.read(token_id, index - 1);
+    local syscall_ptr: felt* = syscall_ptr;
+    local pedersen_ptr: HashBuiltin* = pedersen_ptr;
+    if (token.collection == other_token.collection and token.id.low == other_token.id.low and
+            token.id.high == other_token.id.high) {
+        return index - 1;
+    }
+    return _find_parent_token(token_id, index - 1, other_token);
+}
+
+func _add_child_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        child_tokens_len: felt,
+        index: felt,
+        child_tokens_ptr: Token*
+) {
+    if (index == 0) {
+        return ();
+    }
+
+    let (exists) = Derivable_is_child_token.read(token_id, [child_tokens_ptr]);
+    with_attr error_message("Derivable: already a child token") {
+        assert exists = FALSE;
+    }
+    Derivable_child_tokens.write(token_id, child_tokens_len, [child_tokens_ptr]);
+    Derivable_is_child_token.write(token_id, [child_tokens_ptr], TRUE);
+    Derivable_child_token_index.write(token_id, [child_tokens_ptr], child_tokens_len + 1);
+    _add_child_tokens(token_id, child_tokens_len + 1, index - 1, child_tokens_ptr + Token.SIZE);
+    return ();
+}
+
+// Moves the last child token into the slot of each removed one
+func _remove_child_tokens{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        child_tokens_len: felt,
+        index: felt,
+        child_tokens_ptr: Token*
+) {
+    alloc_locals;
+    if (index == 0) {
+        return ();
+    }
+
+    let slot = _child_token_slot(token_id, child_tokens_len, [child_tokens_ptr]);
+    let (last_token) = Derivable_child_tokens.read(token_id, child_tokens_len - 1);
+    Derivable_child_tokens.write(token_id, slot, last_token);
+    Derivable_child_token_index.write(token_id, last_token, slot + 1);
+    Derivable_child_token_index.write(token_id, [child_tokens_ptr], 0);
+    Derivable_is_child_token.write(token_id, [child_tokens_ptr], FALSE);
+    _remove_child_tokens(token_id, child_tokens_len - 1, index - 1, child_tokens_ptr + Token.SIZE);
+    return ();
+}
+
+func _child_token_slot{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        child_tokens_len: felt,
+        other_token: Token
+) -> felt {
+    let (index) = Derivable_child_token_index.read(token_id, other_token);
+    if (index != 0) {
+        return index - 1;
+    }
+    let (exists) = Derivable_is_child_token.read(token_id, other_token);
+    with_attr error_message("Derivable: not a child token") {
+        assert exists = TRUE;
+    }
+    let slot = _find_child_token(token_id, child_tokens_len, other_token);
+    return slot;
+}
+
+func _find_child_token{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        index: felt,
+        other_token: Token
+) -> felt {
+    alloc_locals;
+    let (token) = Derivable_child_tokens.read(token_id, index - 1);
+    local syscall_ptr: felt* = syscall_ptr;
+    local pedersen_ptr: HashBuiltin* = pedersen_ptr;
+    if (token.collection == other_token.collection and token.id.low == other_token.id.low and
+            token.id.high == other_token.id.high) {
+        return index - 1;
+    }
+    return _find_child_token(token_id, index - 1, other_token);
+}
@@ -3,13 +3,21 @@
 %lang starknet
 
 from starkware.cairo.common.alloc import alloc
+from starkware.cairo.common.bool import TRUE, FALSE
 from starkware.cairo.common.cairo_builtins import HashBuiltin
-from starkware.cairo.common.uint256 import Uint256, uint256_check
+from starkware.cairo.common.math import unsigned_div_rem
+from starkware.cairo.common.uint256 import Uint256, uint256_check, uint256_unsigned_div_rem
+
+// Decimal digits held by each felt of a token ID suffix
+const DIGITS_PER_FELT = 31;
+const DIGITS_PER_FELT_BASE = 10 ** 31;
+const ASCII_ZERO = '0';
 
 //
 // Storage
 //
 
+// Zero for single-felt token URIs, whose felt alone is stored
 @storage_var
 func ERC721Ext_token_uri_len(token_id: Uint256) -> (len: felt) {
 }
@@ -18,12 +26,26 @@ func ERC721Ext_token_uri_len(token_id: Uint256) -> (len: felt) {
 func ERC721Ext_token_uri(token_id: Uint256, index: felt) -> (token_uri: felt) {
 }
 
+@storage_var
+func ERC721Ext_base_uri_len() -> (len: felt) {
+}
+
+@storage_var
+func ERC721Ext_base_uri(index: felt) -> (base_uri: felt) {
+}
+
+@storage_var
+func ERC721Ext_token_id_suffix() -> (res: felt) {
+}
+
 namespace ERC721Ext {
 
     //
     // Getters
     //
 
+    // Returns the base URI followed by the URI stored for the token, or by
+    // the decimal token ID if none is stored and token ID suffixes are enabled
     func token_uri{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
             token_id: Uint256
     ) -> (
@@ -35,10 +57,42 @@ namespace ERC721Ext {
             uint256_check(token_id);
         }
 
-        let (local token_uri_len) = ERC721Ext_token_uri_len.read(token_id);
-        let (local token_uri: felt*) = alloc();
-        _token_uri(token_id, token_uri_len, token_uri);
-        return (token_uri_len=token_uri_len, token_uri=token_uri);
+        let (local base_uri_len, local token_uri: felt*) = base_uri();
+        let suffix_len = _stored_token_uri_len(token_id);
+        if (suffix_len != 0) {
+            _token_uri(token_id, suffix_len, token_uri + base_uri_len);
+            return (token_uri_len=base_uri_len + suffix_len, token_uri=token_uri);
+        }
+
+        let (token_id_suffix) = ERC721Ext_token_id_suffix.read();
+        if (token_id_suffix == TRUE) {
+            let id_len = _decimal_token_id(token_id, token_uri + base_uri_len);
+            return (token_uri_len=base_uri_len + id_len, token_uri=token_uri);
+        }
+        return (token_uri_len=base_uri_len, token_uri=token_uri);
+    }
+
+    func base_uri{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+    ) -> (
+            base_uri_len: felt,
+            base_uri: felt*
+    ) {
+        alloc_locals;
+        let (local base_uri_len) = ERC721Ext_base_uri_len.read();
+        let (local base_uri: felt*) = alloc();
+        _base_uri(base_uri_len, base_uri);
+        return (base_uri_len=base_uri_len, base_uri=base_uri);
+    }
+
+    func token_id_suffix{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+    ) -> (
+            res: felt
+    ) {
+        let (res) = ERC721Ext_token_id_suffix.read();
+        if (res == TRUE) {
+            return (res=TRUE);
+        }
+        return (res=FALSE);
     }
 
     //
@@ -55,11 +109,53 @@ namespace ERC721Ext {
             uint256_check(token_id);
         }
 
+        let (previous_token_uri_len) = ERC721Ext_token_uri_len.read(token_id);
+        if (token_uri_len == 1) {
+            ERC721Ext_token_uri.write(token_id, 0, [token_uri]);
+            if (previous_token_uri_len != 0) {
+                ERC721Ext_token_uri_len.write(token_id, 0);
+                return ();
+            }
+            return ();
+        }
+        if (token_uri_len == 0) {
+            // Also clears a previous single-felt token URI
+            ERC721Ext_token_uri.write(token_id, 0, 0);
+            if (previous_token_uri_len != 0) {
+                ERC721Ext_token_uri_len.write(token_id, 0);
+                return ();
+            }
+            return ();
+        }
+
         _set_token_uri(token_id, token_uri_len, token_uri);
         ERC721Ext_token_uri_len.write(token_id, token_uri_len);
         return ();
     }
 
+    func set_base_uri{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            base_uri_len: felt,
+            base_uri: felt*
+    ) {
+        _set_base_uri(base_uri_len, base_uri);
+        ERC721Ext_base_uri_len.write(base_uri_len);
+        return ();
+    }
+
+    func set_token_id_suffix{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            value: felt
+    ) {
+        with_attr error_message("ERC721Ext: value is not a valid boolean") {
+            assert value * (value - 1) = 0;
+        }
+        if (value == TRUE) {
+            ERC721Ext_token_id_suffix.write(TRUE);
+            return ();
+        }
+        ERC721Ext_token_id_suffix.write(FALSE);
+        return ();
+    }
+
 }
 
 //
@@ -94,3 +190,88 @@ func _set_token_uri{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_
     _set_token_uri(token_id, token_uri_index - 1, token_uri_ptr + 1);
     return ();
 }
+
+func _stored_token_uri_len{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256
+) -> felt {
+    let (token_uri_len) = ERC721Ext_token_uri_len.read(token_id);
+    if (token_uri_len != 0) {
+        return token_uri_len;
+    }
+    let (token_uri) = ERC721Ext_token_uri.read(token_id, 0);
+    if (token_uri != 0) {
+        return 1;
+    }
+    return 0;
+}
+
+func _base_uri{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        base_uri_index: felt,
+        base_uri_ptr: felt*
+) {
+    if (base_uri_index == 0) {
+        return ();
+    }
+
+    let (base_uri) = ERC721Ext_base_uri.read(base_uri_index - 1);
+    assert [base_uri_ptr] = base_uri;
+    _base_uri(base_uri_index - 1, base_uri_ptr + 1);
+    return ();
+}
+
+func _set_base_uri{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        base_uri_index: felt,
+        base_uri_ptr: felt*
+) {
+    if (base_uri_index == 0) {
+        return ();
+    }
+
+    ERC721Ext_base_uri.write(base_uri_index - 1, [base_uri_ptr]);
+    _set_base_uri(base_uri_index - 1, base_uri_ptr + 1);
+    return ();
+}
+
+// Writes the token ID in decimal as short strings of up to 31 digits,
+// most significant first, and returns the number of felts written
+func _decimal_token_id{range_check_ptr}(
+        token_id: Uint256,
+        token_id_ptr: felt*
+) -> felt {
+    alloc_locals;
+    let (quotient, remainder) = uint256_unsigned_div_rem(token_id, Uint256(DIGITS_PER_FELT_BASE, 0));
+    if (quotient.low + quotient.high == 0) {
+        let digits = _decimal_shortstring(remainder.low, 1, 1, 0);
+        assert [token_id_ptr] = digits;
+        return 1;
+    }
+
+    let len = _decimal_token_id(quotient, token_id_ptr);
+    // Lower chunks keep their leading zeros
+    let digits = _decimal_shortstring(remainder.low, DIGITS_PER_FELT, 1, 0);
+    assert [token_id_ptr + len] = digits;
+    return len + 1;
+}
+
+func _decimal_shortstring{range_check_ptr}(
+        value: felt,
+        min_digits: felt,
+        multiplier: felt,
+        acc: felt
+) -> felt {
+    alloc_locals;
+    let (quotient, digit) = unsigned_div_rem(value, 10);
+    local range_check_ptr = range_check_ptr;
+    local remaining_digits;
+    if (min_digits == 0) {
+        assert remaining_digits = 0;
+    } else {
+        assert remaining_digits = min_digits - 1;
+    }
+
+    let acc = acc + (ASCII_ZERO + digit) * multiplier;
+    if (quotient == 0 and remaining_digits == 0) {
+        return acc;
+    }
+    return _decimal_shortstring(quotient, remaining_digits, multiplier * 256, acc);
+}
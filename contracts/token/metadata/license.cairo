@@ -5,6 +5,8 @@
 from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.bool import TRUE, FALSE
 from starkware.cairo.common.cairo_builtins import HashBuiltin
+from starkware.cairo.common.math import assert_le, assert_not_zero, unsigned_div_rem
+from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.uint256 import Uint256, uint256_check
 
 from contracts.common.royalty import Royalty
@@ -26,6 +28,8 @@ const LICENSEES_KEY = 'licensees';
 
 // Array of unpacked Royalty structs
 const ROYALTIES_KEY = 'royalties';
+// Bounds the cost of reading royalties on every sale
+const MAX_ROYALTIES_PER_LEVEL = 8;
 
 //
 // Storage
@@ -55,6 +59,24 @@ func DerivativeLicense_author_settings(token_id: Uint256, key: felt) -> (value:
 func DerivativeLicense_author_array_settings(token_id: Uint256, key: felt, index: felt) -> (value: felt) {
 }
 
+// Storage index of each licensee in the licensees array plus one, or zero if absent
+@storage_var
+func DerivativeLicense_collection_licensee_index(licensee: felt) -> (index: felt) {
+}
+
+@storage_var
+func DerivativeLicense_token_licensee_index(token_id: Uint256, licensee: felt) -> (index: felt) {
+}
+
+// Whether the licensees array has been indexed, which it is not if set before the index existed
+@storage_var
+func DerivativeLicense_collection_licensees_indexed() -> (res: felt) {
+}
+
+@storage_var
+func DerivativeLicense_token_licensees_indexed(token_id: Uint256) -> (res: felt) {
+}
+
 namespace DerivativeLicense {
 
     //
@@ -114,15 +136,35 @@ namespace DerivativeLicense {
 
         let (collection_royalties_len) = DerivativeLicense_collection_settings.read(ROYALTIES_KEY);
         _collection_array_settings(ROYALTIES_KEY, collection_royalties_len, royalties);
-        let (token_royalties_len) = DerivativeLicense_token_settings.read(token_id, ROYALTIES_KEY);
-        _token_array_settings(token_id, ROYALTIES_KEY, token_royalties_len, royalties + collection_royalties_len);
-        let (author_royalties_len) = DerivativeLicense_author_settings.read(token_id, ROYALTIES_KEY);
-        _author_array_settings(token_id, ROYALTIES_KEY, author_royalties_len, royalties + collection_royalties_len + token_royalties_len);
+        let token_royalties_len = _token_royalties(token_id, royalties + collection_royalties_len);
 
-        let royalties_len = collection_royalties_len + token_royalties_len + author_royalties_len;
+        let royalties_len = collection_royalties_len + token_royalties_len;
         return (royalties_len=(royalties_len / Royalty.SIZE), royalties=cast(royalties, Royalty*));
     }
 
+    // The royalties of all the tokens are concatenated,
+    // with royalties_lens holding the number of royalties for each token
+    func royalties_of{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_ids_len: felt,
+            token_ids: Uint256*
+    ) -> (
+            royalties_lens: felt*,
+            royalties_len: felt,
+            royalties: Royalty*
+    ) {
+        alloc_locals;
+        // Collection royalties are shared by all the tokens, so are read once
+        let (local collection_royalties: felt*) = alloc();
+        let (local collection_royalties_len) = DerivativeLicense_collection_settings.read(ROYALTIES_KEY);
+        _collection_array_settings(ROYALTIES_KEY, collection_royalties_len, collection_royalties);
+
+        let (local royalties_lens: felt*) = alloc();
+        let (local royalties: felt*) = alloc();
+        let royalties_len = _royalties_of(
+            token_ids_len, token_ids, collection_royalties_len, collection_royalties, royalties_lens, royalties);
+        return (royalties_lens=royalties_lens, royalties_len=(royalties_len / Royalty.SIZE), royalties=cast(royalties, Royalty*));
+    }
+
     func is_drag_along{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
             token_id: Uint256
     ) -> (
@@ -251,6 +293,14 @@ namespace DerivativeLicense {
         with_attr error_message("DerivativeLicense: unrecognized key {key}") {
             assert (key - LICENSEES_KEY) = 0;
         }
+        let (index) = DerivativeLicense_collection_licensee_index.read(elem);
+        if (index != 0) {
+            return (res=TRUE);
+        }
+        let (indexed) = DerivativeLicense_collection_licensees_indexed.read();
+        if (indexed == TRUE) {
+            return (res=FALSE);
+        }
         let (values_len) = DerivativeLicense_collection_settings.read(key);
         let res = _in_collection_array_settings(key, values_len, elem);
         return (res=res);
@@ -269,6 +319,14 @@ namespace DerivativeLicense {
         with_attr error_message("DerivativeLicense: unrecognized key {key}") {
             assert (key - LICENSEES_KEY) = 0;
         }
+        let (index) = DerivativeLicense_token_licensee_index.read(token_id, elem);
+        if (index != 0) {
+            return (res=TRUE);
+        }
+        let (indexed) = DerivativeLicense_token_licensees_indexed.read(token_id);
+        if (indexed == TRUE) {
+            return (res=FALSE);
+        }
         let (values_len) = DerivativeLicense_token_settings.read(token_id, key);
         let res = _in_token_array_settings(token_id, key, values_len, elem);
         return (res=res);
@@ -297,6 +355,20 @@ namespace DerivativeLicense {
         with_attr error_message("DerivativeLicense: unrecognized key {key}") {
             assert (key - LICENSEES_KEY) * (key - ROYALTIES_KEY) = 0;
         }
+        _check_royalties(key, values_len);
+        if (key == LICENSEES_KEY) {
+            let (previous_values_len) = DerivativeLicense_collection_settings.read(key);
+            _clear_collection_licensee_index(previous_values_len);
+            _set_collection_licensee_index(values_len, values);
+            DerivativeLicense_collection_licensees_indexed.write(TRUE);
+            tempvar syscall_ptr = syscall_ptr;
+            tempvar pedersen_ptr = pedersen_ptr;
+            tempvar range_check_ptr = range_check_ptr;
+        } else {
+            tempvar syscall_ptr = syscall_ptr;
+            tempvar pedersen_ptr = pedersen_ptr;
+            tempvar range_check_ptr = range_check_ptr;
+        }
         _set_collection_array_settings(key, values_len, values);
         DerivativeLicense_collection_settings.write(key, values_len);
         return ();
@@ -329,8 +401,53 @@ namespace DerivativeLicense {
         with_attr error_message("DerivativeLicense: unrecognized key {key}") {
             assert (key - LICENSEES_KEY) * (key - ROYALTIES_KEY) = 0;
         }
-        _set_token_array_settings(token_id, key, values_len, values);
-        DerivativeLicense_token_settings.write(token_id, key, values_len);
+        _write_token_array_settings(token_id, key, values_len, values);
+        return ();
+    }
+
+    // Sets the same value for all the tokens if values_len is 1, or one value per token otherwise
+    func set_token_settings_batch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_ids_len: felt,
+            token_ids: Uint256*,
+            key: felt,
+            values_len: felt,
+            values: felt*
+    ) {
+        with_attr error_message("DerivativeLicense: unrecognized key {key}") {
+            assert (key - ALLOW_TRANSFER_KEY) * (key - DRAG_ALONG_KEY) = 0;
+        }
+        with_attr error_message("DerivativeLicense: array lengths mismatch") {
+            assert (values_len - 1) * (values_len - token_ids_len) = 0;
+        }
+        if (values_len == token_ids_len) {
+            _set_token_settings_batch(token_ids_len, token_ids, key, values, 1);
+            return ();
+        }
+        _set_token_settings_batch(token_ids_len, token_ids, key, values, 0);
+        return ();
+    }
+
+    // Sets the same array for all the tokens if values_lens_len is 1, or the concatenated
+    // arrays of all the tokens otherwise, with values_lens holding the length for each token
+    func set_token_array_settings_batch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_ids_len: felt,
+            token_ids: Uint256*,
+            key: felt,
+            values_lens_len: felt,
+            values_lens: felt*,
+            values: felt*
+    ) {
+        with_attr error_message("DerivativeLicense: unrecognized key {key}") {
+            assert (key - LICENSEES_KEY) * (key - ROYALTIES_KEY) = 0;
+        }
+        with_attr error_message("DerivativeLicense: array lengths mismatch") {
+            assert (values_lens_len - 1) * (values_lens_len - token_ids_len) = 0;
+        }
+        if (values_lens_len == token_ids_len) {
+            _set_token_array_settings_batch(token_ids_len, token_ids, key, values_lens, values, 1);
+            return ();
+        }
+        _set_token_array_settings_batch(token_ids_len, token_ids, key, values_lens, values, 0);
         return ();
     }
 
@@ -361,8 +478,109 @@ namespace DerivativeLicense {
         with_attr error_message("DerivativeLicense: unrecognized key {key}") {
             assert (key - ROYALTIES_KEY) = 0;
         }
-        _set_author_array_settings(token_id, key, values_len, values);
-        DerivativeLicense_author_settings.write(token_id, key, values_len);
+        _write_author_array_settings(token_id, key, values_len, values);
+        return ();
+    }
+
+    // Same layout as set_token_array_settings_batch
+    func set_author_array_settings_batch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_ids_len: felt,
+            token_ids: Uint256*,
+            key: felt,
+            values_lens_len: felt,
+            values_lens: felt*,
+            values: felt*
+    ) {
+        with_attr error_message("DerivativeLicense: unrecognized key {key}") {
+            assert (key - ROYALTIES_KEY) = 0;
+        }
+        with_attr error_message("DerivativeLicense: array lengths mismatch") {
+            assert (values_lens_len - 1) * (values_lens_len - token_ids_len) = 0;
+        }
+        if (values_lens_len == token_ids_len) {
+            _set_author_array_settings_batch(token_ids_len, token_ids, key, values_lens, values, 1);
+            return ();
+        }
+        _set_author_array_settings_batch(token_ids_len, token_ids, key, values_lens, values, 0);
+        return ();
+    }
+
+
+    func add_collection_licensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            licensee: felt
+    ) {
+        alloc_locals;
+        _index_collection_licensees();
+        let (index) = DerivativeLicense_collection_licensee_index.read(licensee);
+        with_attr error_message("DerivativeLicense: already a licensee") {
+            assert index = 0;
+        }
+        let (values_len) = DerivativeLicense_collection_settings.read(LICENSEES_KEY);
+        DerivativeLicense_collection_array_settings.write(LICENSEES_KEY, values_len, licensee);
+        DerivativeLicense_collection_licensee_index.write(licensee, values_len + 1);
+        DerivativeLicense_collection_settings.write(LICENSEES_KEY, values_len + 1);
+        return ();
+    }
+
+    func remove_collection_licensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            licensee: felt
+    ) {
+        alloc_locals;
+        _index_collection_licensees();
+        let (local index) = DerivativeLicense_collection_licensee_index.read(licensee);
+        with_attr error_message("DerivativeLicense: not a licensee") {
+            assert_not_zero(index);
+        }
+        // Moves the last licensee into the freed slot
+        let (values_len) = DerivativeLicense_collection_settings.read(LICENSEES_KEY);
+        let (last_licensee) = DerivativeLicense_collection_array_settings.read(LICENSEES_KEY, values_len - 1);
+        DerivativeLicense_collection_array_settings.write(LICENSEES_KEY, index - 1, last_licensee);
+        DerivativeLicense_collection_licensee_index.write(last_licensee, index);
+        DerivativeLicense_collection_licensee_index.write(licensee, 0);
+        DerivativeLicense_collection_settings.write(LICENSEES_KEY, values_len - 1);
+        return ();
+    }
+
+    func add_token_licensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_id: Uint256,
+            licensee: felt
+    ) {
+        alloc_locals;
+        with_attr error_message("DerivativeLicense: token_id is not a valid Uint256") {
+            uint256_check(token_id);
+        }
+        _index_token_licensees(token_id);
+        let (index) = DerivativeLicense_token_licensee_index.read(token_id, licensee);
+        with_attr error_message("DerivativeLicense: already a licensee") {
+            assert index = 0;
+        }
+        let (values_len) = DerivativeLicense_token_settings.read(token_id, LICENSEES_KEY);
+        DerivativeLicense_token_array_settings.write(token_id, LICENSEES_KEY, values_len, licensee);
+        DerivativeLicense_token_licensee_index.write(token_id, licensee, values_len + 1);
+        DerivativeLicense_token_settings.write(token_id, LICENSEES_KEY, values_len + 1);
+        return ();
+    }
+
+    func remove_token_licensee{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            token_id: Uint256,
+            licensee: felt
+    ) {
+        alloc_locals;
+        with_attr error_message("DerivativeLicense: token_id is not a valid Uint256") {
+            uint256_check(token_id);
+        }
+        _index_token_licensees(token_id);
+        let (local index) = DerivativeLicense_token_licensee_index.read(token_id, licensee);
+        with_attr error_message("DerivativeLicense: not a licensee") {
+            assert_not_zero(index);
+        }
+        // Moves the last licensee into the freed slot
+        let (values_len) = DerivativeLicense_token_settings.read(token_id, LICENSEES_KEY);
+        let (last_licensee) = DerivativeLicense_token_array_settings.read(token_id, LICENSEES_KEY, values_len - 1);
+        DerivativeLicense_token_array_settings.write(token_id, LICENSEES_KEY, index - 1, last_licensee);
+        DerivativeLicense_token_licensee_index.write(token_id, last_licensee, index);
+        DerivativeLicense_token_licensee_index.write(token_id, licensee, 0);
+        DerivativeLicense_token_settings.write(token_id, LICENSEES_KEY, values_len - 1);
         return ();
     }
 
@@ -372,6 +590,180 @@ namespace DerivativeLicense {
 // Private
 //
 
+func _write_token_array_settings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        key: felt,
+        values_len: felt,
+        values: felt*
+) {
+    _check_royalties(key, values_len);
+    if (key == LICENSEES_KEY) {
+        let (previous_values_len) = DerivativeLicense_token_settings.read(token_id, key);
+        _clear_token_licensee_index(token_id, previous_values_len);
+        _set_token_licensee_index(token_id, values_len, values);
+        DerivativeLicense_token_licensees_indexed.write(token_id, TRUE);
+        tempvar syscall_ptr = syscall_ptr;
+        tempvar pedersen_ptr = pedersen_ptr;
+        tempvar range_check_ptr = range_check_ptr;
+    } else {
+        tempvar syscall_ptr = syscall_ptr;
+        tempvar pedersen_ptr = pedersen_ptr;
+        tempvar range_check_ptr = range_check_ptr;
+    }
+    _set_token_array_settings(token_id, key, values_len, values);
+    DerivativeLicense_token_settings.write(token_id, key, values_len);
+    return ();
+}
+
+func _write_author_array_settings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        key: felt,
+        values_len: felt,
+        values: felt*
+) {
+    _check_royalties(key, values_len);
+    _set_author_array_settings(token_id, key, values_len, values);
+    DerivativeLicense_author_settings.write(token_id, key, values_len);
+    return ();
+}
+
+// The value pointer advances only when each token has its own value
+func _set_token_settings_batch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_ids_index: felt,
+        token_ids_ptr: Uint256*,
+        key: felt,
+        value_ptr: felt*,
+        per_token: felt
+) {
+    if (token_ids_index == 0) {
+        return ();
+    }
+
+    with_attr error_message("DerivativeLicense: token_id is not a valid Uint256") {
+        uint256_check([token_ids_ptr]);
+    }
+    DerivativeLicense_token_settings.write([token_ids_ptr], key, [value_ptr]);
+    _set_token_settings_batch(token_ids_index - 1, token_ids_ptr + Uint256.SIZE, key, value_ptr + per_token, per_token);
+    return ();
+}
+
+// The length and value pointers advance only when each token has its own array
+func _set_token_array_settings_batch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_ids_index: felt,
+        token_ids_ptr: Uint256*,
+        key: felt,
+        values_lens_ptr: felt*,
+        values_ptr: felt*,
+        per_token: felt
+) {
+    if (token_ids_index == 0) {
+        return ();
+    }
+
+    with_attr error_message("DerivativeLicense: token_id is not a valid Uint256") {
+        uint256_check([token_ids_ptr]);
+    }
+    _write_token_array_settings([token_ids_ptr], key, [values_lens_ptr], values_ptr);
+    _set_token_array_settings_batch(
+        token_ids_index - 1,
+        token_ids_ptr + Uint256.SIZE,
+        key,
+        values_lens_ptr + per_token,
+        values_ptr + [values_lens_ptr] * per_token,
+        per_token
+    );
+    return ();
+}
+
+func _set_author_array_settings_batch{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_ids_index: felt,
+        token_ids_ptr: Uint256*,
+        key: felt,
+        values_lens_ptr: felt*,
+        values_ptr: felt*,
+        per_token: felt
+) {
+    if (token_ids_index == 0) {
+        return ();
+    }
+
+    with_attr error_message("DerivativeLicense: token_id is not a valid Uint256") {
+        uint256_check([token_ids_ptr]);
+    }
+    _write_author_array_settings([token_ids_ptr], key, [values_lens_ptr], values_ptr);
+    _set_author_array_settings_batch(
+        token_ids_index - 1,
+        token_ids_ptr + Uint256.SIZE,
+        key,
+        values_lens_ptr + per_token,
+        values_ptr + [values_lens_ptr] * per_token,
+        per_token
+    );
+    return ();
+}
+
+func _check_royalties{range_check_ptr}(
+        key: felt,
+        values_len: felt
+) {
+    if (key != ROYALTIES_KEY) {
+        return ();
+    }
+    let (_, remainder) = unsigned_div_rem(values_len, Royalty.SIZE);
+    with_attr error_message("DerivativeLicense: royalties must be receiver and fraction pairs") {
+        assert remainder = 0;
+    }
+    with_attr error_message("DerivativeLicense: too many royalties") {
+        assert_le(values_len, MAX_ROYALTIES_PER_LEVEL * Royalty.SIZE);
+    }
+    return ();
+}
+
+// Writes the token and author royalties of the token and returns their total length
+func _token_royalties{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        royalties_ptr: felt*
+) -> felt {
+    alloc_locals;
+    let (local token_royalties_len) = DerivativeLicense_token_settings.read(token_id, ROYALTIES_KEY);
+    _token_array_settings(token_id, ROYALTIES_KEY, token_royalties_len, royalties_ptr);
+    let (author_royalties_len) = DerivativeLicense_author_settings.read(token_id, ROYALTIES_KEY);
+    _author_array_settings(token_id, ROYALTIES_KEY, author_royalties_len, royalties_ptr + token_royalties_len);
+    return token_royalties_len + author_royalties_len;
+}
+
+func _royalties_of{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_ids_len: felt,
+        token_ids_ptr: Uint256*,
+        collection_royalties_len: felt,
+        collection_royalties: felt*,
+        royalties_lens_ptr: felt*,
+        royalties_ptr: felt*
+) -> felt {
+    alloc_locals;
+    if (token_ids_len == 0) {
+        return 0;
+    }
+
+    with_attr error_message("DerivativeLicense: token_id is not a valid Uint256") {
+        uint256_check([token_ids_ptr]);
+    }
+    memcpy(royalties_ptr, collection_royalties, collection_royalties_len);
+    let token_royalties_len = _token_royalties([token_ids_ptr], royalties_ptr + collection_royalties_len);
+    local royalties_len = collection_royalties_len + token_royalties_len;
+    assert [royalties_lens_ptr] = royalties_len / Royalty.SIZE;
+
+    let rest_len = _royalties_of(
+        token_ids_len - 1,
+        token_ids_ptr + Uint256.SIZE,
+        collection_royalties_len,
+        collection_royalties,
+        royalties_lens_ptr + 1,
+        royalties_ptr + royalties_len
+    );
+    return royalties_len + rest_len;
+}
+
 func _collection_array_settings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
         key: felt,
         index: felt,
@@ -493,3 +885,100 @@ func _set_author_array_settings{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*,
     _set_author_array_settings(token_id, key, index - 1, value_ptr + 1);
     return ();
 }
+
+func _index_collection_licensees{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+) {
+    alloc_locals;
+    let (indexed) = DerivativeLicense_collection_licensees_indexed.read();
+    if (indexed == TRUE) {
+        return ();
+    }
+
+    let (local values: felt*) = alloc();
+    let (values_len) = DerivativeLicense_collection_settings.read(LICENSEES_KEY);
+    _collection_array_settings(LICENSEES_KEY, values_len, values);
+    _set_collection_licensee_index(values_len, values);
+    DerivativeLicense_collection_licensees_indexed.write(TRUE);
+    return ();
+}
+
+func _index_token_licensees{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256
+) {
+    alloc_locals;
+    let (indexed) = DerivativeLicense_token_licensees_indexed.read(token_id);
+    if (indexed == TRUE) {
+        return ();
+    }
+
+    let (local values: felt*) = alloc();
+    let (values_len) = DerivativeLicense_token_settings.read(token_id, LICENSEES_KEY);
+    _token_array_settings(token_id, LICENSEES_KEY, values_len, values);
+    _set_token_licensee_index(token_id, values_len, values);
+    DerivativeLicense_token_licensees_indexed.write(token_id, TRUE);
+    return ();
+}
+
+func _clear_collection_licensee_index{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        index: felt
+) {
+    if (index == 0) {
+        return ();
+    }
+
+    let (licensee) = DerivativeLicense_collection_array_settings.read(LICENSEES_KEY, index - 1);
+    DerivativeLicense_collection_licensee_index.write(licensee, 0);
+    _clear_collection_licensee_index(index - 1);
+    return ();
+}
+
+func _clear_token_licensee_index{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        index: felt
+) {
+    if (index == 0) {
+        return ();
+    }
+
+    let (licensee) = DerivativeLicense_token_array_settings.read(token_id, LICENSEES_KEY, index - 1);
+    DerivativeLicense_token_licensee_index.write(token_id, licensee, 0);
+    _clear_token_licensee_index(token_id, index - 1);
+    return ();
+}
+
+// Mirrors the storage layout of _set_collection_array_settings
+func _set_collection_licensee_index{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        index: felt,
+        licensee_ptr: felt*
+) {
+    if (index == 0) {
+        return ();
+    }
+
+    let (existing_index) = DerivativeLicense_collection_licensee_index.read([licensee_ptr]);
+    with_attr error_message("DerivativeLicense: duplicate licensee") {
+        assert existing_index = 0;
+    }
+    DerivativeLicense_collection_licensee_index.write([licensee_ptr], index);
+    _set_collection_licensee_index(index - 1, licensee_ptr + 1);
+    return ();
+}
+
+// Mirrors the storage layout of _set_token_array_settings
+func _set_token_licensee_index{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+        token_id: Uint256,
+        index: felt,
+        licensee_ptr: felt*
+) {
+    if (index == 0) {
+        return ();
+    }
+
+    let (existing_index) = DerivativeLicense_token_licensee_index.read(token_id, [licensee_ptr]);
+    with_attr error_message("DerivativeLicense: duplicate licensee") {
+        assert existing_index = 0;
+    }
+    DerivativeLicense_token_licensee_index.write(token_id, [licensee_ptr], index);
+    _set_token_licensee_index(token_id, index - 1, licensee_ptr + 1);
+    return ();
+}
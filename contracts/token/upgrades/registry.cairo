@@ -2,8 +2,20 @@
 
 %lang starknet
 
+from starkware.cairo.common.bool import TRUE, FALSE
 from starkware.cairo.common.cairo_builtins import HashBuiltin
 from starkware.cairo.common.math import assert_not_zero
+from starkware.starknet.common.syscalls import get_caller_address, get_contract_address
+
+from contracts.registry.interface import ITokenRegistry
+
+//
+// Constants
+//
+
+// 0: not pushed by the registry yet; 1: secondary token; 2: not secondary token
+const SECONDARY_TOKEN = 1;
+const NOT_SECONDARY_TOKEN = 2;
 
 //
 // Events
@@ -21,6 +33,10 @@ func RegistryUpgraded(previousRegistry: felt, newRegistry: felt) {
 func RegistryProxy_registry() -> (registry: felt) {
 }
 
+@storage_var
+func RegistryProxy_secondary_token() -> (value: felt) {
+}
+
 namespace RegistryProxy {
 
     //
@@ -35,18 +51,85 @@ namespace RegistryProxy {
         return (registry=registry);
     }
 
+    func is_secondary_token{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+    ) -> felt {
+        let (value) = RegistryProxy_secondary_token.read();
+        if (value == SECONDARY_TOKEN) {
+            return TRUE;
+        }
+        if (value == NOT_SECONDARY_TOKEN) {
+            return FALSE;
+        }
+        let (registry) = RegistryProxy_registry.read();
+        let (contract) = get_contract_address();
+        let (primary_addr) = ITokenRegistry.getPrimaryTokenAddress(registry, contract);
+        if (primary_addr == 0) {
+            return FALSE;
+        }
+        return TRUE;
+    }
+
+    //
+    // Public
+    //
+
+    func assert_only_registry{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+    ) {
+        let (caller) = get_caller_address();
+        let (registry) = RegistryProxy_registry.read();
+        with_attr error_message("RegistryProxy: caller is not the registry") {
+            assert caller = registry;
+        }
+        return ();
+    }
+
+    func sync_primary_token_address{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+    ) {
+        // The registry pushes every later change once the callback is enabled
+        let (registry) = RegistryProxy_registry.read();
+        let (primary_addr) = ITokenRegistry.enablePrimaryTokenCallback(registry);
+        _set_primary_token_address(primary_addr);
+        return ();
+    }
+
     //
     // Internals
     //
 
+    func _set_primary_token_address{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
+            primary_addr: felt
+    ) {
+        if (primary_addr == 0) {
+            RegistryProxy_secondary_token.write(NOT_SECONDARY_TOKEN);
+        } else {
+            RegistryProxy_secondary_token.write(SECONDARY_TOKEN);
+        }
+        return ();
+    }
+
     func _set_registry{syscall_ptr: felt*, pedersen_ptr: HashBuiltin*, range_check_ptr}(
             new_registry: felt
     ) {
+        alloc_locals;
         with_attr error_message("RegistryProxy: new_registry is the zero address") {
             assert_not_zero(new_registry);
         }
-        let (previous_registry) = RegistryProxy_registry.read();
+        let (local previous_registry) = RegistryProxy_registry.read();
+        // A cached value means the previous registry pushes to this token, which would now reject it
+        let (value) = RegistryProxy_secondary_token.read();
+        if (value != 0) {
+            ITokenRegistry.disablePrimaryTokenCallback(previous_registry);
+            tempvar syscall_ptr = syscall_ptr;
+            tempvar pedersen_ptr = pedersen_ptr;
+            tempvar range_check_ptr = range_check_ptr;
+        } else {
+            tempvar syscall_ptr = syscall_ptr;
+            tempvar pedersen_ptr = pedersen_ptr;
+            tempvar range_check_ptr = range_check_ptr;
+        }
         RegistryProxy_registry.write(new_registry);
+        // The new registry has not pushed its primary token address yet
+        RegistryProxy_secondary_token.write(0);
         RegistryUpgraded.emit(previous_registry, new_registry);
         return ();
     }
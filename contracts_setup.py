@@ -0,0 +1,17 @@
+import os
+
+from nile.utils import str_to_felt
+from starkware.starknet.public.abi import get_selector_from_name
+
+
+# How the contracts_init fixture deploys the contracts, shared by the tests and benchmarks
+PROXY_ADMIN_ADDRESS = 0x1111111111111111111111111111111111111111
+COLLECTION_OWNER_ADDRESS = 0x2222222222222222222222222222222222222222
+
+PROXY_FILE = os.path.join('contracts', 'proxy', 'Proxy.cairo')
+REGISTRY_FILE = os.path.join('contracts', 'registry', 'TokenRegistry.cairo')
+TOKEN_FILE = os.path.join('contracts', 'token', 'DerivativeToken.cairo')
+
+INITIALIZER_SELECTOR = get_selector_from_name('initializer')
+NAME = str_to_felt('name')
+SYMBOL = str_to_felt('symbol')
@@ -0,0 +1,64 @@
+import functools
+import json
+import pathlib
+
+from starknet_py.net.client_models import Call
+from starknet_py.utils.data_transformer import FunctionCallSerializer
+from starkware.cairo.lang.compiler.identifier_manager import IdentifierManager
+from starkware.starknet.public.abi import AbiType, get_selector_from_name
+from starkware.starknet.public.abi_structs import identifier_manager_from_abi
+
+
+@functools.lru_cache(maxsize=None)
+def load_compiled_contract(compiled_file: str) -> str:
+    return pathlib.Path(compiled_file).read_text()
+
+
+@functools.lru_cache(maxsize=None)
+def load_abi(abi_file: str) -> AbiType:
+    return json.loads(pathlib.Path(abi_file).read_bytes())
+
+
+@functools.lru_cache(maxsize=None)
+def load_interface(abi_file: str) -> 'ContractInterface':
+    return ContractInterface(load_abi(abi_file))
+
+
+class ContractInterface:
+    """Parsed ABI shared by every contract of the same class, preparing
+    calls without rebuilding the ABI metadata for each contract."""
+
+    def __init__(self, abi: AbiType):
+        self.abi = abi
+        self.identifier_manager: IdentifierManager = identifier_manager_from_abi(abi)
+        self._functions = {entry['name']: entry for entry in abi if entry['type'] == 'function'}
+        self._events = {entry['name']: entry for entry in abi if entry['type'] == 'event'}
+        self.event_names = {get_selector_from_name(name): name for name in self._events}
+        self._serializers: dict[str, FunctionCallSerializer] = {}
+        self._selectors: dict[str, int] = {}
+        # Kept apart, as an event may share its name with a function
+        self._event_serializers: dict[str, FunctionCallSerializer] = {}
+
+    def serializer(self, name: str) -> FunctionCallSerializer:
+        serializer = self._serializers.get(name)
+        if serializer is None:
+            serializer = self._serializers[name] = FunctionCallSerializer(
+                abi=self._functions[name], identifier_manager=self.identifier_manager)
+            self._selectors[name] = get_selector_from_name(name)
+        return serializer
+
+    def prepare(self, address: int, name: str, *args, **kwargs) -> Call:
+        calldata, _ = self.serializer(name).from_python(*args, **kwargs)
+        return Call(to_addr=address, selector=self._selectors[name], calldata=calldata)
+
+    def decode(self, name: str, result: list[int]) -> tuple:
+        return tuple(self.serializer(name).to_python(result))
+
+    def decode_event(self, name: str, data: list[int]) -> tuple:
+        serializer = self._event_serializers.get(name)
+        if serializer is None:
+            # Event data is laid out like the outputs of a function
+            entry = {'type': 'function', 'name': name, 'inputs': [], 'outputs': self._events[name]['data']}
+            serializer = self._event_serializers[name] = FunctionCallSerializer(
+                abi=entry, identifier_manager=self.identifier_manager)
+        return tuple(serializer.to_python(data))
@@ -1,14 +1,33 @@
 import argparse
+import asyncio
+import dataclasses
+import fnmatch
+import hashlib
 import json
+import os
 import pathlib
-from typing import Optional, Union
+import time
+from typing import Callable, Optional, Union
 
 from starknet_py.contract import Contract, DeclareResult, DeployResult
 from starknet_py.net import AccountClient, KeyPair
+from starknet_py.net.account.account_client import merge_calls
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.client_models import Call, Calls, SentTransactionResponse, TransactionStatus
 from starknet_py.net.gateway_client import GatewayClient
+from starknet_py.net.models import Invoke
 from starknet_py.net.models.chains import StarknetChainId
 from starknet_py.net.networks import MAINNET, TESTNET, TESTNET2
-from starkware.starknet.public.abi import AbiType
+from starknet_py.utils.data_transformer.execute_transformer import execute_transformer_by_version
+from starknet_py.utils.iterable import ensure_iterable
+
+from gateway import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_SECOND,
+    RequestThrottle,
+    ThrottledGatewayClient,
+    is_transient
+)
 
 
 NETWORKS = {
@@ -31,14 +50,31 @@ ACCOUNT_NAMES = (
     'comoco_bank'
 )
 
+# Extra admin accounts are named comoco_admin_1, comoco_admin_2, ...
+ADMIN_ACCOUNT_NAME = 'comoco_admin'
+
 MAX_FEE = int(1e15)
 
+BATCH_SIZE = 100
+MAX_BATCH_SIZE = 500
+MAX_BATCH_FEE = MAX_FEE * BATCH_SIZE
+FEE_MARGIN = 1.5
+
+STEPS_EXHAUSTED_MESSAGE = 'RunResources has no remaining steps'
+INVALID_NONCE_ERROR = 'StarknetErrorCode.INVALID_TRANSACTION_NONCE'
+
+KIND_CLASS = 'class'
+KIND_REGISTRY = 'registry'
+KIND_TOKEN = 'token'
+
+network = 'devnet'
 deploy_token = None
-output_file = 'deployments.txt'
+output_file = 'deployments.jsonl'
+declare_cache_file = 'declared_classes.json'
 
 
 def parse_arguments(parser: argparse.ArgumentParser):
-    global deploy_token, output_file
+    global network, deploy_token, output_file, declare_cache_file
     parser.add_argument(
         '--network', dest='network', default='devnet',
         help='The name of the StarkNet network'
@@ -53,11 +89,25 @@ def parse_arguments(parser: argparse.ArgumentParser):
     )
     parser.add_argument(
         '--output', dest='output_file', default=output_file,
-        help='The txt file to output the deployed contract addresses'
+        help='The json lines file to record the declared classes and deployed contracts'
+    )
+    parser.add_argument(
+        '--declare_cache', dest='declare_cache_file', default=declare_cache_file,
+        help='The json file caching the class hashes of declared artifacts'
+    )
+    parser.add_argument(
+        '--requests_per_second', dest='requests_per_second', type=float, default=MAX_REQUESTS_PER_SECOND,
+        help='The maximum number of gateway requests started per second'
+    )
+    parser.add_argument(
+        '--concurrent_requests', dest='concurrent_requests', type=int, default=MAX_CONCURRENT_REQUESTS,
+        help='The maximum number of gateway requests in flight at a time'
     )
     args = parser.parse_args()
+    network = args.network
     deploy_token = args.deploy_token
     output_file = args.output_file
+    declare_cache_file = args.declare_cache_file
     return args
 
 
@@ -67,7 +117,11 @@ def _setup_accounts(
     accounts: Union[dict, list]
 ) -> dict[str, AccountClient]:
     if isinstance(accounts, list):
+        # Predeployed accounts beyond the named ones serve as extra admins
+        extra_accounts = accounts[len(ACCOUNT_NAMES):]
         accounts = dict(zip(ACCOUNT_NAMES, accounts[:len(ACCOUNT_NAMES)]))
+        for i, account_info in enumerate(extra_accounts, 1):
+            accounts[f"{ADMIN_ACCOUNT_NAME}_{i}"] = account_info
     else:
         accounts = accounts[network]
     account_clients = {}
@@ -83,29 +137,362 @@ def _setup_accounts(
     return account_clients
 
 
-def create_clients(args) -> tuple[GatewayClient, dict[str, AccountClient]]:
+def create_gateway_client(args) -> ThrottledGatewayClient:
+    # To be closed once the script is done
+    return ThrottledGatewayClient(
+        NETWORKS[args.network],
+        RequestThrottle(args.requests_per_second, args.concurrent_requests)
+    )
+
+
+def create_clients(args) -> tuple[ThrottledGatewayClient, dict[str, AccountClient]]:
     p = pathlib.Path(args.accounts_file).expanduser()
     with p.open() as f:
         accounts = json.load(f)
 
-    gateway_client = GatewayClient(NETWORKS[args.network])
+    # Every account shares the session and request limits of one client
+    gateway_client = create_gateway_client(args)
     account_clients = _setup_accounts(args.network, gateway_client, accounts)
 
     return gateway_client, account_clients
 
 
-def load_compiled_contract(compiled_file: str) -> str:
-    return pathlib.Path(compiled_file).read_text()
+def admin_clients(
+    account_clients: dict[str, AccountClient],
+    max_signers: Optional[int] = None
+) -> list[AccountClient]:
+    """Returns comoco_admin followed by the extra admin accounts in order,
+    at most max_signers of them when given."""
+    prefix = f"{ADMIN_ACCOUNT_NAME}_"
+    extra_names = sorted(
+        (name for name in account_clients if name.startswith(prefix) and name[len(prefix):].isdigit()),
+        key=lambda name: int(name[len(prefix):])
+    )
+    clients = [account_clients[name] for name in [ADMIN_ACCOUNT_NAME] + extra_names]
+    return clients if max_signers is None else clients[:max_signers]
 
 
-def load_abi(abi_file: str) -> AbiType:
-    with open(abi_file, 'r') as f:
-        return json.load(f)
+class NonceManager:
+    """Hands out consecutive nonces of an account so that several
+    transactions can be in flight without waiting for each other.
+
+    Once a transaction fails, the transactions signed with later nonces
+    fail in turn, so the nonce is only read again from the chain when
+    none is left in flight, and never below the lowest failed one."""
+
+    def __init__(self, account_client: AccountClient):
+        self.account_client = account_client
+        self._nonce = None
+        self._pending_nonce = None
+        self._failed_nonce = None
+        self._in_flight = 0
+        self._sent: dict[int, int] = {}
+        self._settled = asyncio.Condition()
+
+    async def next_nonce(self) -> int:
+        async with self._settled:
+            await self._settled.wait_for(lambda: self._failed_nonce is None or self._in_flight == 0)
+            if self._nonce is None or self._failed_nonce is not None:
+                nonce = await self.account_client.get_contract_nonce(
+                    self.account_client.address, block_hash='pending')
+                # A lagging node must not hand out the nonce of an accepted transaction again
+                self._nonce = nonce if self._failed_nonce is None else max(nonce, self._failed_nonce)
+                self._failed_nonce = None
+            nonce = self._nonce
+            self._nonce += 1
+            self._in_flight += 1
+            return nonce
+
+    async def pending_nonce(self, refresh: bool = False) -> int:
+        """Returns the nonce of the account in the pending block, which fee
+        estimates have to be signed with, read again only on refresh."""
+        if self._pending_nonce is None or refresh:
+            self._pending_nonce = await self.account_client.get_contract_nonce(
+                self.account_client.address, block_hash='pending')
+        return self._pending_nonce
+
+    def sent(self, tx_hash: int, nonce: int):
+        self._sent[tx_hash] = nonce
+
+    async def settle(self, nonce: int, failed: bool):
+        async with self._settled:
+            self._in_flight -= 1
+            if failed:
+                self._failed_nonce = nonce if self._failed_nonce is None else min(self._failed_nonce, nonce)
+            self._settled.notify_all()
+
+    async def wait_for_tx(self, tx_hash: int) -> tuple[int, TransactionStatus]:
+        """Waits for a transaction sent with a nonce from this manager,
+        which is only handed out again if the transaction failed."""
+        nonce = self._sent.pop(tx_hash)
+        failed = True
+        try:
+            result = await self.account_client.wait_for_tx(tx_hash)
+            failed = False
+            return result
+        finally:
+            await self.settle(nonce, failed)
+
+
+def _build_invoke(
+    account_client: AccountClient,
+    calls: Calls,
+    max_fee: int,
+    nonce: int
+) -> Invoke:
+    calldata, _ = execute_transformer_by_version(account_client.supported_tx_version).from_python(
+        *merge_calls(ensure_iterable(calls)))
+    return Invoke(
+        contract_address=account_client.address,
+        calldata=calldata,
+        signature=[],
+        max_fee=max_fee,
+        version=account_client.supported_tx_version,
+        nonce=nonce
+    )
+
+
+async def execute_calls(
+    account_client: AccountClient,
+    calls: Calls,
+    max_fee: int,
+    nonce_manager: Optional[NonceManager] = None
+) -> SentTransactionResponse:
+    if nonce_manager is None:
+        return await account_client.execute(calls=calls, max_fee=max_fee)
+
+    nonce = await nonce_manager.next_nonce()
+    transaction = _build_invoke(account_client, calls, max_fee, nonce)
+    signature = account_client.signer.sign_transaction(transaction)
+    try:
+        resp = await account_client.send_transaction(dataclasses.replace(transaction, signature=signature))
+    except Exception:
+        await nonce_manager.settle(nonce, failed=True)
+        raise
+    nonce_manager.sent(resp.transaction_hash, nonce)
+    return resp
+
+
+@dataclasses.dataclass
+class Signer:
+    account_client: AccountClient
+    nonce_manager: NonceManager
+    in_flight: int = 0
+    last_used: int = 0
 
 
-def save_hash(name: str, hash: int):
+class SignerPool:
+    """Spreads the transactions of a job over several accounts, each with
+    its own nonce stream, so that throughput is not capped by the
+    sequential nonces of a single account.
+
+    Every acquire hands out the signer with the fewest transactions in
+    flight, the least recently used one among ties, and waits while every
+    signer already has window transactions in flight."""
+
+    def __init__(self, account_clients: list[AccountClient], window: int = 1):
+        if not account_clients:
+            raise ValueError("A signer pool needs at least one account")
+        self.signers = [Signer(account_client, NonceManager(account_client)) for account_client in account_clients]
+        self.window = window
+        self._uses = 0
+        self._available = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return len(self.signers)
+
+    async def acquire(self) -> Signer:
+        async with self._available:
+            await self._available.wait_for(lambda: any(s.in_flight < self.window for s in self.signers))
+            signer = min(self.signers, key=lambda s: (s.in_flight, s.last_used))
+            self._uses += 1
+            signer.in_flight += 1
+            signer.last_used = self._uses
+            return signer
+
+    async def release(self, signer: Signer):
+        async with self._available:
+            signer.in_flight -= 1
+            self._available.notify()
+
+
+async def estimate_calls_fee(
+    account_client: AccountClient,
+    calls: Calls,
+    nonce: int
+) -> int:
+    estimated_fee = await account_client.estimate_fee(_build_invoke(account_client, calls, 0, nonce))
+    return estimated_fee.overall_fee
+
+
+class CallBatcher:
+    """Sizes multicalls from fee estimates so that every transaction stays
+    within the step and fee limits, and prices its max_fee accordingly.
+
+    A batch that runs out of steps or fails transiently is halved; a batch
+    over the fee limit is shrunk in proportion. The size grows back while
+    estimates leave enough headroom, but never again to a size that ran out
+    of steps. A batch with a reverting call is split down to the calls
+    before it, without shrinking later batches."""
+
+    def __init__(
+        self,
+        account_client: AccountClient,
+        nonce_manager: Optional[NonceManager] = None,
+        batch_size: int = BATCH_SIZE,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_batch_fee: int = MAX_BATCH_FEE
+    ):
+        self.account_client = account_client
+        self.nonce_manager = nonce_manager or NonceManager(account_client)
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.max_batch_fee = max_batch_fee
+
+    async def fit(
+        self,
+        calls: list,
+        build: Optional[Callable[[list], Calls]] = None
+    ) -> tuple[int, int]:
+        """Returns how many of the leading calls to send in one transaction
+        together with the max_fee to send them with. When given, build turns
+        the leading items into the calls actually sent, e.g. a single batch call."""
+        size = min(self.batch_size, len(calls))
+        refreshed = False
+        while True:
+            try:
+                leading = calls[:size] if build is None else build(calls[:size])
+                nonce = await self.nonce_manager.pending_nonce()
+                fee = await estimate_calls_fee(self.account_client, leading, nonce)
+            except ClientError as e:
+                if INVALID_NONCE_ERROR in e.message and not refreshed:
+                    # Transactions sent since the nonce was read reached the pending block
+                    await self.nonce_manager.pending_nonce(refresh=True)
+                    refreshed = True
+                    continue
+                if size == 1:
+                    raise
+                if STEPS_EXHAUSTED_MESSAGE in str(e):
+                    self.max_batch_size = size - 1
+                    size = self.batch_size = size // 2
+                elif is_transient(e):
+                    size = self.batch_size = size // 2
+                else:
+                    size //= 2
+                continue
+            if fee > self.max_batch_fee and size > 1:
+                size = self.batch_size = max(1, size * self.max_batch_fee // fee)
+                continue
+            break
+        if size == self.batch_size and fee * 2 <= self.max_batch_fee:
+            # Approach the largest size not known to run out of steps
+            self.batch_size = min(size * 2, (size + self.max_batch_size + 1) // 2)
+        return size, int(fee * FEE_MARGIN)
+
+
+async def execute_batched(
+    account_client: AccountClient,
+    calls: list[Call],
+    batcher: Optional[CallBatcher] = None
+) -> list[SentTransactionResponse]:
+    """Sends the calls in as few multicalls as the batcher allows, all of
+    them in flight at once, and waits until every one is accepted. Returns
+    the response of the multicall carrying each call."""
+    nonce_manager = NonceManager(account_client)
+    batcher = batcher or CallBatcher(account_client, nonce_manager)
+    responses = []
+    while calls:
+        size, max_fee = await batcher.fit(calls)
+        resp = await execute_calls(account_client, calls[:size], max_fee, nonce_manager)
+        responses += [resp] * size
+        calls = calls[size:]
+    await asyncio.gather(*(
+        nonce_manager.wait_for_tx(tx_hash)
+        for tx_hash in dict.fromkeys(resp.transaction_hash for resp in responses)
+    ))
+    return responses
+
+
+def _format_hash(hash: Optional[int]) -> Optional[str]:
+    return None if hash is None else f"0x{hash:x}"
+
+
+def save_deployment(
+    name: str,
+    kind: str,
+    class_hash: Optional[int] = None,
+    address: Optional[int] = None,
+    tx_hash: Optional[int] = None
+):
+    entry = {
+        'network': network,
+        'name': name,
+        'kind': kind,
+        'class_hash': _format_hash(class_hash),
+        'address': _format_hash(address),
+        'tx_hash': _format_hash(tx_hash),
+        'timestamp': int(time.time())
+    }
     with open(output_file, 'a') as f:
-        f.write(f"{name}: 0x{hash:x}\n")
+        f.write(json.dumps(entry) + '\n')
+
+
+class DeploymentManifest:
+    """Index over the entries recorded by save_deployment for the current
+    network, where later entries supersede earlier ones of the same name."""
+
+    def __init__(self):
+        self._by_name: dict[tuple[str, str], dict] = {}
+        self._by_address: dict[int, dict] = {}
+        if not os.path.exists(output_file):
+            return
+        with open(output_file) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['network'] != network:
+                    continue
+                self._by_name[(entry['kind'], entry['name'])] = entry
+                if entry['address'] is not None:
+                    self._by_address[int(entry['address'], 0)] = entry
+
+    def by_name(self, kind: str, name: str) -> Optional[dict]:
+        return self._by_name.get((kind, name))
+
+    def by_address(self, address: int) -> Optional[dict]:
+        return self._by_address.get(address)
+
+    def select(self, kind: str, pattern: str) -> list[dict]:
+        if not any(c in pattern for c in '*?['):
+            entry = self.by_name(kind, pattern)
+            return [] if entry is None else [entry]
+        return [
+            entry for (entry_kind, name), entry in self._by_name.items()
+            if entry_kind == kind and fnmatch.fnmatchcase(name, pattern)
+        ]
+
+
+def select_addresses(kind: str, patterns: list[str]) -> list[int]:
+    manifest = DeploymentManifest()
+    addresses = []
+    for pattern in patterns:
+        entries = manifest.select(kind, pattern)
+        if not entries:
+            raise ValueError(f"No {kind} deployment matches {pattern} on {network}")
+        addresses += [int(entry['address'], 0) for entry in entries]
+    return list(dict.fromkeys(addresses))
+
+
+def _load_declare_cache() -> dict[str, dict[str, str]]:
+    if not os.path.exists(declare_cache_file):
+        return {}
+    with open(declare_cache_file) as f:
+        return json.load(f)
+
+
+def _save_declare_cache(cache: dict[str, dict[str, str]]):
+    with open(declare_cache_file + '.tmp', 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(declare_cache_file + '.tmp', declare_cache_file)
 
 
 async def declare_contract(
@@ -113,6 +500,27 @@ async def declare_contract(
     compiled_contract: str,
     wait_for_accept: Optional[bool] = True
 ) -> DeclareResult:
+    # Classes are cached by network and artifact content, but only trusted
+    # once the chain confirms the class is still declared (e.g. on devnet)
+    network = str(account_client.net)
+    artifact_hash = hashlib.sha256(compiled_contract.encode()).hexdigest()
+    cache = _load_declare_cache()
+    class_hash = cache.get(network, {}).get(artifact_hash)
+    if class_hash is not None:
+        try:
+            await account_client.get_class_by_hash(class_hash)
+        except ClientError:
+            pass
+        else:
+            print(f"Class {class_hash} already declared, skipping...")
+            return DeclareResult(
+                hash=None,
+                _client=account_client.client,
+                class_hash=int(class_hash, 0),
+                _account=account_client,
+                compiled_contract=compiled_contract
+            )
+
     declare_result = await Contract.declare(
         account=account_client,
         compiled_contract=compiled_contract,
@@ -120,6 +528,8 @@ async def declare_contract(
     )
     if wait_for_accept:
         await declare_result.wait_for_acceptance()
+        cache.setdefault(network, {})[artifact_hash] = f"0x{declare_result.class_hash:x}"
+        _save_declare_cache(cache)
     return declare_result
 
 
@@ -4,13 +4,15 @@ import os
 
 from starkware.starknet.public.abi import get_selector_from_name
 
+from artifacts import load_compiled_contract
 from common import (
+    KIND_CLASS,
+    KIND_REGISTRY,
     create_clients,
     declare_contract,
     deploy_contract,
-    load_compiled_contract,
     parse_arguments,
-    save_hash
+    save_deployment
 )
 
 
@@ -27,33 +29,43 @@ INITIALIZER_SELECTOR = get_selector_from_name('initializer')
 async def main():
     parser = argparse.ArgumentParser()
     args = parse_arguments(parser)
-    _, account_clients = create_clients(args)
-
-    print("Declaring TokenRegistry class...")
-    registry_declare_result = await declare_contract(
-        account_clients['comoco_dev'],
-        load_compiled_contract(COMPILED_REGISTRY_FILE)
-    )
-    save_hash('Registry Class', registry_declare_result.class_hash)
-
-    print("Declaring Proxy class...")
-    proxy_declare_result = await declare_contract(
-        account_clients['comoco_dev'],
-        load_compiled_contract(COMPILED_PROXY_FILE)
-    )
-
-    print("Deploying TokenRegistry contract...")
-    registry_deploy_result = await deploy_contract(
-        proxy_declare_result,
-        [
-            registry_declare_result.class_hash,
-            INITIALIZER_SELECTOR,
+    gateway_client, account_clients = create_clients(args)
+
+    async with gateway_client:
+        print("Declaring TokenRegistry class...")
+        registry_declare_result = await declare_contract(
+            account_clients['comoco_dev'],
+            load_compiled_contract(COMPILED_REGISTRY_FILE)
+        )
+        save_deployment(
+            'TokenRegistry', KIND_CLASS,
+            class_hash=registry_declare_result.class_hash,
+            tx_hash=registry_declare_result.hash
+        )
+
+        print("Declaring Proxy class...")
+        proxy_declare_result = await declare_contract(
+            account_clients['comoco_dev'],
+            load_compiled_contract(COMPILED_PROXY_FILE)
+        )
+
+        print("Deploying TokenRegistry contract...")
+        registry_deploy_result = await deploy_contract(
+            proxy_declare_result,
             [
-                account_clients['comoco_dev'].address
+                registry_declare_result.class_hash,
+                INITIALIZER_SELECTOR,
+                [
+                    account_clients['comoco_dev'].address
+                ]
             ]
-        ]
-    )
-    save_hash('Registry Contract', registry_deploy_result.deployed_contract.address)
+        )
+        save_deployment(
+            'TokenRegistry', KIND_REGISTRY,
+            class_hash=registry_declare_result.class_hash,
+            address=registry_deploy_result.deployed_contract.address,
+            tx_hash=registry_deploy_result.hash
+        )
 
 
 if __name__ == '__main__':
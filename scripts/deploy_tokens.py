@@ -2,20 +2,26 @@ import argparse
 import asyncio
 import os
 
-from starknet_py.contract import Contract, DeclareResult
+from starknet_py.common import create_compiled_contract
+from starknet_py.contract import Contract
 from starknet_py.net import AccountClient
+from starknet_py.net.client_models import Call
+from starknet_py.net.udc_deployer.deployer import ContractDeployment, Deployer
 from starkware.starknet.public.abi import AbiType
 from starkware.starknet.public.abi import get_selector_from_name
 
+from artifacts import load_abi, load_compiled_contract
 from common import (
-    MAX_FEE,
+    KIND_CLASS,
+    KIND_REGISTRY,
+    KIND_TOKEN,
+    DeploymentManifest,
+    admin_clients,
     create_clients,
     declare_contract,
-    deploy_contract,
-    load_abi,
-    load_compiled_contract,
+    execute_batched,
     parse_arguments,
-    save_hash
+    save_deployment
 )
 
 
@@ -85,17 +91,19 @@ TOKENS_CONFIG = {
 }
 
 
-async def deploy_token_contract(
-    proxy_declare_result: DeclareResult,
-    token_abi: AbiType,
+def prepare_token_deployment(
+    deployer: Deployer,
+    proxy_abi: AbiType,
+    proxy_class_hash: int,
     token_class_hash: int,
     registry_contract_address: int,
     account_clients: dict[str, AccountClient],
     config: dict
-) -> Contract:
-    token_deploy_result = await deploy_contract(
-        proxy_declare_result,
-        [
+) -> ContractDeployment:
+    return deployer.create_deployment_call(
+        class_hash=proxy_class_hash,
+        abi=proxy_abi,
+        calldata=[
             token_class_hash,
             INITIALIZER_SELECTOR,
             [
@@ -107,25 +115,30 @@ async def deploy_token_contract(
             ]
         ]
     )
-    return Contract(
-        token_deploy_result.deployed_contract.address,
-        token_abi,
-        account_clients['comoco_admin']
-    )
 
 
-async def setup_token_contract(
-    account_clients: dict[str, AccountClient],
+def prepare_registry_setup(
     registry_contract: Contract,
+    token_contracts: dict[str, Contract]
+) -> list[Call]:
+    # All the collections are registered in a single call
+    primary_addrs = {
+        token_contracts[token].address: config['primary_addr']
+        for token, config in TOKENS_CONFIG.items() if 'primary_addr' in config
+    }
+    if not primary_addrs:
+        return []
+    return [registry_contract.functions['setPrimaryTokenAddresses'].prepare(
+        list(primary_addrs), list(primary_addrs.values()))]
+
+
+def prepare_token_setup(
+    account_clients: dict[str, AccountClient],
     token_contract: Contract,
     config: dict
-):
-    if 'primary_addr' in config:
-        invocation = await registry_contract.functions['setPrimaryTokenAddress'].invoke(
-            token_contract.address, config['primary_addr'], max_fee=MAX_FEE)
-        await invocation.wait_for_acceptance()
-
-    calls = []
+) -> list[Call]:
+    # Has the registry push later changes of the primary token address
+    calls = [token_contract.functions['syncPrimaryTokenAddress'].prepare()]
     if 'allow_transfer' in config:
         calls.append(token_contract.functions['setCollectionSettings'].prepare(
             'allow_transfer', config['allow_transfer']))
@@ -135,53 +148,85 @@ async def setup_token_contract(
     if 'royalties' in config:
         calls.append(token_contract.functions['setCollectionArraySettings'].prepare(
             'royalties', [account_clients['comoco_bank'].address, config['royalties']]))
-    if calls:
-        resp = await account_clients['comoco_admin'].execute(calls=calls, max_fee=MAX_FEE * len(calls))
-        await account_clients['comoco_admin'].wait_for_tx(resp.transaction_hash)
+    # The extra admin accounts mint alongside comoco_admin, the owner
+    for admin_client in admin_clients(account_clients)[1:]:
+        calls.append(token_contract.functions['setAdmin'].prepare(admin_client.address, 1))
+    return calls
 
 
 async def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        '--registry_address', dest='registry_address', required=True,
-        help='The address of the deployed TokenRegistry contract'
+        '--registry_address', dest='registry_address',
+        help='The address of the deployed TokenRegistry contract, or the recorded one if omitted'
     )
     args = parse_arguments(parser)
 
-    _, account_clients = create_clients(args)
-    registry_contract = Contract(
-        args.registry_address,
-        load_abi(REGISTRY_ABI_FILE),
-        account_clients['comoco_admin']
-    )
-
-    print("Declaring DerivativeToken class...")
-    token_declare_result = await declare_contract(
-        account_clients['comoco_dev'],
-        load_compiled_contract(COMPILED_TOKEN_FILE)
-    )
-    save_hash('Token Class', token_declare_result.class_hash)
+    if args.registry_address is None:
+        registry = DeploymentManifest().by_name(KIND_REGISTRY, 'TokenRegistry')
+        if registry is None:
+            parser.error("no recorded TokenRegistry deployment, --registry_address is required")
+        args.registry_address = registry['address']
+
+    gateway_client, account_clients = create_clients(args)
+    async with gateway_client:
+        registry_contract = Contract(
+            args.registry_address,
+            load_abi(REGISTRY_ABI_FILE),
+            account_clients['comoco_admin']
+        )
 
-    print("Declaring Proxy class...")
-    proxy_declare_result = await declare_contract(
-        account_clients['comoco_dev'],
-        load_compiled_contract(COMPILED_PROXY_FILE)
-    )
-    token_abi = load_abi(TOKEN_ABI_FILE)
-
-    for token, config in TOKENS_CONFIG.items():
-        print(f"Deploying DerivativeToken contract for {token}...")
-        token_contract = await deploy_token_contract(
-            proxy_declare_result, token_abi,
-            token_declare_result.class_hash, registry_contract.address,
-            account_clients, config
+        print("Declaring DerivativeToken class...")
+        token_declare_result = await declare_contract(
+            account_clients['comoco_dev'],
+            load_compiled_contract(COMPILED_TOKEN_FILE)
+        )
+        save_deployment(
+            'DerivativeToken', KIND_CLASS,
+            class_hash=token_declare_result.class_hash,
+            tx_hash=token_declare_result.hash
         )
-        save_hash(token + ' Contract', token_contract.address)
 
-        print(f"Setting up DerivativeToken contract for {token}...")
-        await setup_token_contract(
-            account_clients, registry_contract, token_contract, config
+        print("Declaring Proxy class...")
+        proxy_declare_result = await declare_contract(
+            account_clients['comoco_dev'],
+            load_compiled_contract(COMPILED_PROXY_FILE)
+        )
+        proxy_abi = create_compiled_contract(compiled_contract=proxy_declare_result.compiled_contract).abi
+        token_abi = load_abi(TOKEN_ABI_FILE)
+
+        # Deployments depend on nothing but the declared classes, while the setup
+        # of each collection depends on its own deployment only, so every
+        # deployment and then every setup call can be folded into multicalls.
+        print(f"Deploying DerivativeToken contracts for {', '.join(TOKENS_CONFIG)}...")
+        deployer = Deployer(account_address=account_clients['comoco_dev'].address)
+        deployments = {
+            token: prepare_token_deployment(
+                deployer, proxy_abi, proxy_declare_result.class_hash,
+                token_declare_result.class_hash, registry_contract.address,
+                account_clients, config
+            )
+            for token, config in TOKENS_CONFIG.items()
+        }
+        responses = await execute_batched(
+            account_clients['comoco_dev'],
+            [deployment.udc for deployment in deployments.values()]
         )
+        token_contracts = {}
+        for (token, deployment), resp in zip(deployments.items(), responses):
+            save_deployment(
+                token, KIND_TOKEN,
+                class_hash=token_declare_result.class_hash,
+                address=deployment.address,
+                tx_hash=resp.transaction_hash
+            )
+            token_contracts[token] = Contract(deployment.address, token_abi, account_clients['comoco_admin'])
+
+        print("Setting up DerivativeToken contracts...")
+        calls = prepare_registry_setup(registry_contract, token_contracts)
+        for token, config in TOKENS_CONFIG.items():
+            calls += prepare_token_setup(account_clients, token_contracts[token], config)
+        await execute_batched(account_clients['comoco_admin'], calls)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+from collections import Counter, defaultdict, deque
+from typing import AsyncIterator, Iterable, Optional
+
+from artifacts import ContractInterface
+from reader import BulkReader
+
+
+Token = tuple[int, int]
+
+EVENT_PARENTS = 'ParentTokensChanged'
+EVENT_CHILDREN = 'ChildTokensChanged'
+EVENT_PARENTS_ADDED = 'ParentTokensAdded'
+EVENT_PARENTS_REMOVED = 'ParentTokensRemoved'
+EVENT_CHILDREN_ADDED = 'ChildTokensAdded'
+EVENT_CHILDREN_REMOVED = 'ChildTokensRemoved'
+EVENT_PRIMARY = 'PrimaryTokenAddressChanged'
+
+ENTRY_PARENTS = 'parents'
+ENTRY_CHILDREN = 'children'
+ENTRY_PARENTS_ADDED = 'parents_added'
+ENTRY_PARENTS_REMOVED = 'parents_removed'
+ENTRY_CHILDREN_ADDED = 'children_added'
+ENTRY_CHILDREN_REMOVED = 'children_removed'
+ENTRY_PRIMARY = 'primary'
+ENTRY_DRAG_ALONG = 'drag_along'
+ENTRY_CHECKPOINT = 'checkpoint'
+
+TOKENS_ENTRIES = {
+    EVENT_PARENTS: ENTRY_PARENTS,
+    EVENT_CHILDREN: ENTRY_CHILDREN,
+    EVENT_PARENTS_ADDED: ENTRY_PARENTS_ADDED,
+    EVENT_PARENTS_REMOVED: ENTRY_PARENTS_REMOVED,
+    EVENT_CHILDREN_ADDED: ENTRY_CHILDREN_ADDED,
+    EVENT_CHILDREN_REMOVED: ENTRY_CHILDREN_REMOVED
+}
+
+
+def parse_token(token: str) -> Token:
+    collection, id = token.split(':')
+    return int(collection, 0), int(id, 0)
+
+
+def format_token(token: Token) -> str:
+    return f"0x{token[0]:x}:{token[1]}"
+
+
+class DerivationIndex:
+    """Derivation graph of tokens across collections, kept up to date by
+    applying the changes recorded from the token and registry events in
+    chain order."""
+
+    def __init__(self):
+        self.block_number: Optional[int] = None
+        self._parents: dict[Token, set[Token]] = {}
+        self._children: dict[Token, set[Token]] = {}
+        # A parent-child edge is kept while either side of it declares it
+        self._up: dict[Token, Counter] = defaultdict(Counter)
+        self._down: dict[Token, Counter] = defaultdict(Counter)
+        self._primary: dict[int, int] = {}
+        self._drag_along: dict[Token, bool] = {}
+
+    def _link(self, parent: Token, child: Token, delta: int):
+        for edges, node, other in ((self._down, parent, child), (self._up, child, parent)):
+            edges[node][other] += delta
+            if edges[node][other] <= 0:
+                del edges[node][other]
+                if not edges[node]:
+                    del edges[node]
+
+    def set_parent_tokens(self, token: Token, parent_tokens: Iterable[Token]):
+        previous = self._parents.pop(token, set())
+        new = set(parent_tokens)
+        for parent in previous - new:
+            self._link(parent, token, -1)
+        for parent in new - previous:
+            self._link(parent, token, 1)
+        if new:
+            self._parents[token] = new
+
+    def set_child_tokens(self, token: Token, child_tokens: Iterable[Token]):
+        previous = self._children.pop(token, set())
+        new = set(child_tokens)
+        for child in previous - new:
+            self._link(token, child, -1)
+        for child in new - previous:
+            self._link(token, child, 1)
+        if new:
+            self._children[token] = new
+
+    def update_parent_tokens(self, token: Token, added: Iterable[Token] = (), removed: Iterable[Token] = ()):
+        parents = self._parents.get(token, set())
+        self.set_parent_tokens(token, (parents | set(added)) - set(removed))
+
+    def update_child_tokens(self, token: Token, added: Iterable[Token] = (), removed: Iterable[Token] = ()):
+        children = self._children.get(token, set())
+        self.set_child_tokens(token, (children | set(added)) - set(removed))
+
+    def set_primary_token_address(self, secondary_address: int, primary_address: int):
+        if primary_address == 0:
+            self._primary.pop(secondary_address, None)
+        else:
+            self._primary[secondary_address] = primary_address
+
+    def set_drag_along(self, token: Token, drag_along: bool):
+        self._drag_along[token] = drag_along
+
+    def apply(self, entry: dict):
+        kind = entry['type']
+        if kind == ENTRY_PARENTS:
+            self.set_parent_tokens(parse_token(entry['token']), map(parse_token, entry['tokens']))
+        elif kind == ENTRY_CHILDREN:
+            self.set_child_tokens(parse_token(entry['token']), map(parse_token, entry['tokens']))
+        elif kind == ENTRY_PARENTS_ADDED:
+            self.update_parent_tokens(parse_token(entry['token']), added=map(parse_token, entry['tokens']))
+        elif kind == ENTRY_PARENTS_REMOVED:
+            self.update_parent_tokens(parse_token(entry['token']), removed=map(parse_token, entry['tokens']))
+        elif kind == ENTRY_CHILDREN_ADDED:
+            self.update_child_tokens(parse_token(entry['token']), added=map(parse_token, entry['tokens']))
+        elif kind == ENTRY_CHILDREN_REMOVED:
+            self.update_child_tokens(parse_token(entry['token']), removed=map(parse_token, entry['tokens']))
+        elif kind == ENTRY_PRIMARY:
+            self.set_primary_token_address(int(entry['secondary'], 0), int(entry['primary'], 0))
+        elif kind == ENTRY_DRAG_ALONG:
+            self.set_drag_along(parse_token(entry['token']), entry['value'])
+        elif kind == ENTRY_CHECKPOINT:
+            self.block_number = entry['block']
+
+    def parents_of(self, token: Token) -> list[Token]:
+        return sorted(self._up.get(token, ()))
+
+    def children_of(self, token: Token) -> list[Token]:
+        return sorted(self._down.get(token, ()))
+
+    def parent_side_tokens(self) -> list[Token]:
+        return sorted(self._down)
+
+    def primary_token_address(self, collection: int) -> Optional[int]:
+        return self._primary.get(collection)
+
+    def secondary_token_addresses(self, primary_address: int) -> list[int]:
+        return sorted(secondary for secondary, primary in self._primary.items() if primary == primary_address)
+
+    def _walk(self, token: Token, edges: dict[Token, Counter], follow=None) -> list[Token]:
+        # Breadth-first, so that closer relatives come first
+        visited = {token}
+        result = []
+        queue = deque([token])
+        while queue:
+            node = queue.popleft()
+            if follow is not None and not follow(node):
+                continue
+            for other in edges.get(node, ()):
+                if other not in visited:
+                    visited.add(other)
+                    result.append(other)
+                    queue.append(other)
+        return result
+
+    def ancestors(self, token: Token) -> list[Token]:
+        return self._walk(token, self._up)
+
+    def descendants(self, token: Token) -> list[Token]:
+        return self._walk(token, self._down)
+
+    def drag_along(self, token: Token) -> list[Token]:
+        """Returns the descendants moving along with the token, that is the
+        children of every token whose license is drag-along, recursively."""
+        return self._walk(token, self._down, lambda node: self._drag_along.get(node, False))
+
+
+class DerivationStore:
+    """Append-only json lines log of the changes applied to the index,
+    replayed on load so that indexing resumes after the last checkpoint."""
+
+    def __init__(self, store_file: str):
+        self.store_file = store_file
+
+    def load(self) -> DerivationIndex:
+        index = DerivationIndex()
+        if not os.path.exists(self.store_file):
+            return index
+        with open(self.store_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write from a crash
+                # Changes past the last checkpoint are indexed again, which
+                # is harmless since adding or removing a token twice is a no-op
+                index.apply(entry)
+        return index
+
+    def append(self, entries: list[dict]):
+        with open(self.store_file, 'a') as f:
+            f.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class EventSource:
+    """Reads the derivation events emitted in each block from the feeder
+    gateway, which starknet_py only exposes through per-transaction receipts."""
+
+    def __init__(
+        self,
+        reader: BulkReader,
+        token_interface: ContractInterface,
+        registry_interface: ContractInterface,
+        addresses: Optional[set[int]] = None
+    ):
+        self.reader = reader
+        self.token_interface = token_interface
+        self.registry_interface = registry_interface
+        self.addresses = addresses
+
+    def _decode(self, block_number: int, event: dict) -> Optional[dict]:
+        from_address = int(event['from_address'], 16)
+        if self.addresses and from_address not in self.addresses:
+            return None
+        if not event['keys']:
+            return None
+        selector = int(event['keys'][0], 16)
+        data = [int(value, 16) for value in event['data']]
+        name = self.token_interface.event_names.get(selector) or self.registry_interface.event_names.get(selector)
+        if name in TOKENS_ENTRIES:
+            # The changed events carry the full new list last, the others just the delta
+            token_id, *_, tokens = self.token_interface.decode_event(name, data)
+            return {
+                'type': TOKENS_ENTRIES[name],
+                'token': format_token((from_address, token_id)),
+                'tokens': [format_token((token['collection'], token['id'])) for token in tokens],
+                'block': block_number
+            }
+        if name == EVENT_PRIMARY:
+            secondary, _, primary = self.registry_interface.decode_event(name, data)
+            return {
+                'type': ENTRY_PRIMARY,
+                'secondary': f"0x{secondary:x}",
+                'primary': f"0x{primary:x}",
+                'block': block_number
+            }
+        return None
+
+    async def block_entries(self, block_number: int) -> list[dict]:
+        block = await self.reader.client.get_raw_block(block_number)
+        entries = []
+        for receipt in block.get('transaction_receipts', []):
+            for event in receipt.get('events', []):
+                entry = self._decode(block_number, event)
+                if entry is not None:
+                    entries.append(entry)
+        return entries
+
+    async def entries(self, from_block: int, to_block: int) -> AsyncIterator[list[dict]]:
+        """Yields the changes of consecutive chunks of blocks in chain order,
+        each ending with a checkpoint, fetching the blocks of a chunk concurrently."""
+        for chunk_start in range(from_block, to_block + 1, self.reader.concurrency):
+            chunk_end = min(chunk_start + self.reader.concurrency - 1, to_block)
+            blocks = await asyncio.gather(*(
+                self.block_entries(block_number) for block_number in range(chunk_start, chunk_end + 1)))
+            chunk = [entry for entries in blocks for entry in entries]
+            chunk.append({'type': ENTRY_CHECKPOINT, 'block': chunk_end})
+            yield chunk
+
+
+async def sync_index(
+    source: EventSource,
+    index: DerivationIndex,
+    store: DerivationStore,
+    to_block: int,
+    from_block: int = 0
+) -> int:
+    """Indexes the blocks after the last checkpoint of the store, or from
+    from_block on a fresh store, up to to_block."""
+    if index.block_number is None and from_block > 0:
+        # Recorded as the first checkpoint, so that later runs resume from the store alone
+        checkpoint = {'type': ENTRY_CHECKPOINT, 'block': from_block - 1}
+        store.append([checkpoint])
+        index.apply(checkpoint)
+    from_block = 0 if index.block_number is None else index.block_number + 1
+    num_changes = 0
+    async for chunk in source.entries(from_block, to_block):
+        store.append(chunk)
+        for entry in chunk:
+            index.apply(entry)
+        num_changes += len(chunk) - 1
+    return num_changes
+
+
+async def refresh_drag_along(
+    reader: BulkReader,
+    token_interface: ContractInterface,
+    index: DerivationIndex,
+    store: DerivationStore
+) -> int:
+    # License settings emit no events, so drag-along flags are read directly
+    calls = (
+        (token, token_interface.prepare(token[0], 'isDragAlong', token[1]))
+        for token in index.parent_side_tokens()
+    )
+    entries = []
+    async for token, result in reader.stream(calls):
+        if isinstance(result, Exception):
+            continue  # Not a DerivativeToken, or a burnt token
+        value, = token_interface.decode('isDragAlong', result)
+        entries.append({'type': ENTRY_DRAG_ALONG, 'token': format_token(token), 'value': value == 1})
+    store.append(entries)
+    for entry in entries:
+        index.apply(entry)
+    return len(entries)
@@ -0,0 +1,292 @@
+import asyncio
+import dataclasses
+import random
+import sys
+import time
+from typing import Optional, Union
+
+import aiohttp
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.client_models import Hash, Tag, TransactionReceipt, TransactionStatus
+from starknet_py.net.gateway_client import GatewayClient
+from starknet_py.net.http_client import GatewayHttpClient, HttpMethod
+from starknet_py.net.networks import Network
+from starknet_py.transaction_exceptions import TransactionNotReceivedError, TransactionRejectedError
+
+
+MAX_REQUESTS_PER_SECOND = 20
+MAX_CONCURRENT_REQUESTS = 20
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+
+# Sweeps a transaction may stay out of every block before its receipt is checked
+STATUS_CHECK_SWEEPS = 6
+
+TRANSIENT_STATUS_CODES = ('429', '500', '502', '503', '504')
+CONTRACT_ERROR_PREFIX = 'StarknetErrorCode.'
+
+ACCEPTED_STATUSES = (TransactionStatus.ACCEPTED_ON_L2, TransactionStatus.ACCEPTED_ON_L1)
+
+
+def is_transient(e: Exception) -> bool:
+    if isinstance(e, ClientError):
+        # A reverted call is also reported as a 500, with the StarkNet error code in the body
+        return e.code in TRANSIENT_STATUS_CODES and CONTRACT_ERROR_PREFIX not in e.message
+    return isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def retry_delay(attempt: int, backoff: float = RETRY_BACKOFF) -> float:
+    # Jittered so that requests failed together do not retry together
+    return backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+class RequestThrottle:
+    """The HTTP session shared by the requests of a client, together with
+    the limits on how many of them start per second and are in flight."""
+
+    def __init__(
+        self,
+        requests_per_second: float = MAX_REQUESTS_PER_SECOND,
+        concurrency: int = MAX_CONCURRENT_REQUESTS
+    ):
+        self.interval = 1 / requests_per_second
+        self.concurrency = concurrency
+        self._next_start = 0.0
+        self.retries = 0
+        self._in_flight = None
+        self._session = None
+
+    def session(self) -> aiohttp.ClientSession:
+        # Created on first use, as a session belongs to the running event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._in_flight = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def __aenter__(self) -> aiohttp.ClientSession:
+        session = self.session()
+        await self._in_flight.acquire()
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+        return session
+
+    async def __aexit__(self, *exc):
+        self._in_flight.release()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class ThrottledHttpClient(GatewayHttpClient):
+    """Sends every request through the throttle, retrying the idempotent
+    ones the gateway fails transiently with a jittered exponential backoff."""
+
+    def __init__(
+        self,
+        url: str,
+        throttle: RequestThrottle,
+        idempotent: bool,
+        max_retries: int = MAX_RETRIES
+    ):
+        super().__init__(url)
+        self.throttle = throttle
+        self.idempotent = idempotent
+        self.max_retries = max_retries
+
+    async def request(
+        self,
+        address: str,
+        http_method: HttpMethod,
+        params: Optional[dict] = None,
+        payload: Optional[dict] = None
+    ):
+        # Posting a transaction again could make it fail on its nonce
+        retry = self.idempotent or http_method == HttpMethod.GET
+        attempt = 0
+        while True:
+            try:
+                async with self.throttle as session:
+                    return await self._make_request(
+                        session=session, address=address, http_method=http_method, params=params, payload=payload)
+            except Exception as e:
+                if not retry or attempt >= self.max_retries or not is_transient(e):
+                    raise
+            await asyncio.sleep(retry_delay(attempt))
+            attempt += 1
+            self.throttle.retries += 1
+
+
+@dataclasses.dataclass
+class WatchedTransaction:
+    result: asyncio.Future
+    check_interval: float
+    sweeps: int = 0
+
+
+class ReceiptWatcher:
+    """Waits for any number of transactions at once by looking for their
+    hashes in every new block, so that confirming them costs requests per
+    block rather than per transaction.
+
+    A transaction still missing after STATUS_CHECK_SWEEPS sweeps, e.g. one
+    rejected and thus never in a block, has its own receipt checked, as has
+    every transaction after a sweep of the blocks fails. A waiter only fails
+    for its own transaction, rejected, not received or with its receipt
+    failing for good."""
+
+    def __init__(self, client: 'ThrottledGatewayClient', status_check_sweeps: int = STATUS_CHECK_SWEEPS):
+        self.client = client
+        self.status_check_sweeps = status_check_sweeps
+        self._watched: dict[int, WatchedTransaction] = {}
+        self._last_block_number = None
+        self._task = None
+
+    async def wait(self, tx_hash: Hash, check_interval: float = 5) -> tuple[int, TransactionStatus]:
+        key = int(tx_hash, 0) if isinstance(tx_hash, str) else tx_hash
+        watched = self._watched.get(key)
+        if watched is None:
+            watched = WatchedTransaction(asyncio.get_running_loop().create_future(), check_interval)
+            self._watched[key] = watched
+        watched.check_interval = min(watched.check_interval, check_interval)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        # Shielded so that a cancelled waiter does not cancel the others
+        return await asyncio.shield(watched.result)
+
+    async def _run(self):
+        while self._watched:
+            await self._sweep()
+            if self._watched:
+                await asyncio.sleep(min(watched.check_interval for watched in self._watched.values()))
+
+    def _resolve(self, tx_hash: int, block_number: int, status: TransactionStatus):
+        watched = self._watched.pop(tx_hash, None)
+        if watched is not None and not watched.result.done():
+            watched.result.set_result((block_number, status))
+
+    def _fail(self, tx_hash: int, e: Exception):
+        watched = self._watched.pop(tx_hash)
+        if not watched.result.done():
+            watched.result.set_exception(e)
+
+    async def _sweep(self):
+        try:
+            await self._sweep_blocks()
+        except Exception as e:
+            # Every transaction then has its own receipt checked instead
+            print(f"Failed to sweep blocks, checking receipts instead: {e}", file=sys.stderr)
+            for watched in self._watched.values():
+                watched.sweeps = self.status_check_sweeps
+        await self._check_receipts()
+
+    async def _sweep_blocks(self):
+        block_number, status, tx_hashes = await self.client.get_block_transactions('latest')
+        # Blocks before the watcher started are left to the receipt checks
+        from_block_number = block_number if self._last_block_number is None else self._last_block_number + 1
+        missed_blocks = await asyncio.gather(*(
+            self.client.get_block_transactions(number) for number in range(from_block_number, block_number)
+        ))
+        for number, block_status, block_tx_hashes in [*missed_blocks, (block_number, status, tx_hashes)]:
+            if block_status in ACCEPTED_STATUSES:
+                for tx_hash in block_tx_hashes & self._watched.keys():
+                    self._resolve(tx_hash, number, block_status)
+        self._last_block_number = max(block_number, self._last_block_number or 0)
+
+    async def _check_receipts(self):
+        overdue = []
+        for tx_hash, watched in self._watched.items():
+            watched.sweeps += 1
+            if watched.sweeps >= self.status_check_sweeps:
+                watched.sweeps = 0
+                overdue.append(tx_hash)
+        receipts = await asyncio.gather(
+            *(self.client.get_transaction_receipt(tx_hash) for tx_hash in overdue), return_exceptions=True)
+        for tx_hash, receipt in zip(overdue, receipts):
+            if isinstance(receipt, Exception):
+                # Transient errors are left to the next check
+                if is_transient(receipt):
+                    print(f"Failed to check receipt of 0x{tx_hash:x}: {receipt}", file=sys.stderr)
+                else:
+                    self._fail(tx_hash, receipt)
+            elif receipt.status in ACCEPTED_STATUSES and receipt.block_number is not None:
+                self._resolve(tx_hash, receipt.block_number, receipt.status)
+            elif receipt.status == TransactionStatus.REJECTED:
+                self._fail(tx_hash, TransactionRejectedError(message=receipt.rejection_reason))
+            elif receipt.status == TransactionStatus.NOT_RECEIVED:
+                self._fail(tx_hash, TransactionNotReceivedError())
+
+
+class ThrottledGatewayClient(GatewayClient):
+    """GatewayClient whose requests share one session and throttle, whose
+    concurrent polls of the same transaction receipt are collapsed into a
+    single request, and whose wait_for_tx goes through a ReceiptWatcher.
+
+    Closing it, or leaving it as a context manager, closes the session."""
+
+    def __init__(self, net: Network, throttle: Optional[RequestThrottle] = None):
+        super().__init__(net)
+        self.throttle = throttle or RequestThrottle()
+        # Everything but adding transactions only reads from the feeder gateway
+        self._feeder_gateway_client = ThrottledHttpClient(
+            self._feeder_gateway_client.url, self.throttle, idempotent=True)
+        self._gateway_client = ThrottledHttpClient(self._gateway_client.url, self.throttle, idempotent=False)
+        self._receipt_polls: dict[int, asyncio.Future] = {}
+        self.receipt_watcher = ReceiptWatcher(self)
+
+    async def get_transaction_receipt(self, tx_hash: Hash) -> TransactionReceipt:
+        key = int(tx_hash, 0) if isinstance(tx_hash, str) else tx_hash
+        poll = self._receipt_polls.get(key)
+        if poll is None:
+            poll = asyncio.ensure_future(super().get_transaction_receipt(tx_hash))
+            self._receipt_polls[key] = poll
+            poll.add_done_callback(lambda _: self._receipt_polls.pop(key, None))
+        # Shielded so that a cancelled waiter does not cancel the others
+        return await asyncio.shield(poll)
+
+    async def get_block_transactions(
+        self,
+        block_number: Union[int, Tag]
+    ) -> tuple[int, Optional[TransactionStatus], set[int]]:
+        """Returns the number, status and transaction hashes of the block,
+        without parsing its transactions."""
+        block = await self.get_raw_block(block_number)
+        status = next((s for s in ACCEPTED_STATUSES if s.value == block['status']), None)
+        return block['block_number'], status, {int(tx['transaction_hash'], 16) for tx in block['transactions']}
+
+    async def get_raw_block(self, block_number: Union[int, Tag]) -> dict:
+        """Returns the block as the feeder gateway serves it, with the events
+        of every transaction receipt, which starknet_py does not parse."""
+        return await self._feeder_gateway_client.call('get_block', params={'blockNumber': block_number})
+
+    async def get_raw_class_by_hash(self, class_hash: int) -> dict:
+        """Returns the contract class as the gateway serves it, to be loaded
+        as a cairo-lang ContractClass rather than a starknet_py one."""
+        return await self._feeder_gateway_client.call('get_class_by_hash', params={'classHash': hex(class_hash)})
+
+    async def wait_for_tx(
+        self,
+        tx_hash: Hash,
+        wait_for_accept: Optional[bool] = False,
+        check_interval=5
+    ) -> tuple[int, TransactionStatus]:
+        # Pending blocks are not swept, so both modes return once the
+        # transaction is in an accepted block
+        if check_interval <= 0:
+            raise ValueError("check_interval has to bigger than 0.")
+        return await self.receipt_watcher.wait(tx_hash, check_interval)
+
+    async def close(self):
+        await self.throttle.close()
+
+    async def __aenter__(self) -> 'ThrottledGatewayClient':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
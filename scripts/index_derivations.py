@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import os
+import time
+
+from artifacts import load_interface
+from common import (
+    KIND_REGISTRY,
+    KIND_TOKEN,
+    DeploymentManifest,
+    create_gateway_client,
+    parse_arguments
+)
+from derivations import (
+    DerivationStore,
+    EventSource,
+    format_token,
+    parse_token,
+    refresh_drag_along,
+    sync_index
+)
+from reader import BulkReader
+
+
+TOKEN_ABI_FILE = os.path.join(
+    'artifacts', 'abis', 'DerivativeToken.json'
+)
+REGISTRY_ABI_FILE = os.path.join(
+    'artifacts', 'abis', 'TokenRegistry.json'
+)
+
+STORE_FILE = 'derivations_{network}.jsonl'
+
+QUERIES = ('ancestors', 'descendants', 'drag_along')
+
+
+async def first_deployment_block(reader: BulkReader, manifest: DeploymentManifest, addresses: set[int]) -> int:
+    """Returns the block of the earliest recorded deployment of the
+    addresses, or 0 if any of them has no recorded deployment."""
+    tx_hashes = []
+    for address in addresses:
+        deployment = manifest.by_address(address)
+        if deployment is None or deployment['tx_hash'] is None:
+            return 0
+        tx_hashes.append(int(deployment['tx_hash'], 0))
+    receipts = await asyncio.gather(*(
+        reader.client.get_transaction_receipt(tx_hash) for tx_hash in tx_hashes))
+    # A deployment still pending has no block number yet
+    return min((receipt.block_number or 0 for receipt in receipts), default=0)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--store', dest='store_file',
+        help=f"The json lines file storing the indexed changes (default: {STORE_FILE})"
+    )
+    parser.add_argument(
+        '--address', dest='addresses', action='append',
+        help='The contracts to index events from (all recorded tokens and registries by default)'
+    )
+    parser.add_argument(
+        '--from_block', dest='from_block', type=int,
+        help='The first block to index into a new store (the earliest recorded deployment block by default)'
+    )
+    parser.add_argument(
+        '--to_block', dest='to_block', type=int,
+        help='The last block to index (the latest block by default)'
+    )
+    parser.add_argument(
+        '--offline', dest='offline', action='store_true',
+        help='Answer the queries from the store without indexing new blocks'
+    )
+    parser.add_argument(
+        '--refresh_drag_along', dest='refresh_drag_along', action='store_true',
+        help='Read the drag-along license of every token with derivatives'
+    )
+    for query in QUERIES:
+        parser.add_argument(
+            f"--{query}", dest=query, action='append', default=[], metavar='COLLECTION:ID',
+            help=f"The tokens to list the {query.replace('_', '-')} tokens of"
+        )
+    args = parse_arguments(parser)
+
+    store = DerivationStore(args.store_file or STORE_FILE.format(network=args.network))
+    started = time.monotonic()
+    index = store.load()
+    print(f"Loaded derivation index up to block {index.block_number} in {time.monotonic() - started:.3f}s")
+
+    if not args.offline:
+        manifest = DeploymentManifest()
+        if args.addresses:
+            addresses = {int(addr, 0) for addr in args.addresses}
+        else:
+            addresses = {
+                int(deployment['address'], 0)
+                for kind in (KIND_TOKEN, KIND_REGISTRY)
+                for deployment in manifest.select(kind, '*')
+            }
+        async with create_gateway_client(args) as gateway_client:
+            reader = BulkReader(gateway_client, args.concurrent_requests, block_number=args.to_block)
+            to_block = await reader.pin_block()
+            from_block = args.from_block
+            if from_block is None and index.block_number is None:
+                from_block = await first_deployment_block(reader, manifest, addresses)
+            token_interface = load_interface(TOKEN_ABI_FILE)
+            source = EventSource(reader, token_interface, load_interface(REGISTRY_ABI_FILE), addresses)
+            started = time.monotonic()
+            num_changes = await sync_index(source, index, store, to_block, from_block or 0)
+            print(f"Indexed {num_changes} changes up to block {to_block} in {time.monotonic() - started:.1f}s")
+            if args.refresh_drag_along:
+                num_tokens = await refresh_drag_along(reader, token_interface, index, store)
+                print(f"Read the drag-along license of {num_tokens} tokens")
+
+    for query in QUERIES:
+        for token in getattr(args, query):
+            started = time.monotonic()
+            tokens = getattr(index, query)(parse_token(token))
+            elapsed = (time.monotonic() - started) * 1000
+            print(f"{query.replace('_', '-').capitalize()} of {token} ({len(tokens)} tokens in {elapsed:.2f}ms):")
+            for other in tokens:
+                print(f"  {format_token(other)}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
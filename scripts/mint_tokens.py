@@ -1,78 +1,336 @@
 import argparse
 import asyncio
+import bisect
+import json
 import os
 import sys
+import time
+from typing import Callable, Iterator, Optional
 
-from starknet_py.contract import Contract
 from starknet_py.net import AccountClient
-from starknet_py.net.client_models import Calls
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.client_models import Call, Calls
 from starknet_py.transaction_exceptions import TransactionFailedError
+from starkware.starknet.public.abi import get_selector_from_name
 
+from artifacts import load_interface
 from common import (
-    MAX_FEE,
+    BATCH_SIZE,
+    KIND_TOKEN,
+    CallBatcher,
+    DeploymentManifest,
+    NonceManager,
+    Signer,
+    SignerPool,
+    admin_clients,
     create_clients,
-    load_abi,
+    execute_calls,
     parse_arguments,
+    select_addresses
 )
+from preflight import ForkedState, fork_state
 
 
 TOKEN_ABI_FILE = os.path.join(
     'artifacts', 'abis', 'DerivativeToken.json'
 )
 
-BATCH_SIZE = 100
+JOURNAL_FILE = 'mint_journal.jsonl'
+
+IS_ADMIN_SELECTOR = get_selector_from_name('isAdmin')
+
+STATUS_SENT = 'sent'
+STATUS_ACCEPTED = 'accepted'
+STATUS_FAILED = 'failed'
+
+
+class MintJournal:
+    """Append-only record of the ID ranges sent in a mint job and their
+    final status, allowing an interrupted job to be resumed."""
+
+    def __init__(self, journal_file: str, token_address: int):
+        self.journal_file = journal_file
+        self.token_address = token_address
+
+    def record(self, from_id: int, to_id: int, tx_hash: Optional[int], status: str):
+        entry = {
+            'token': f"0x{self.token_address:x}",
+            'from': from_id,
+            'to': to_id,
+            'tx_hash': None if tx_hash is None else f"0x{tx_hash:x}",
+            'status': status
+        }
+        with open(self.journal_file, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self) -> dict[tuple[int, int], dict]:
+        # The last entry of each range wins
+        entries = {}
+        if not os.path.exists(self.journal_file):
+            return entries
+        with open(self.journal_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write from a crash
+                if int(entry['token'], 0) == self.token_address:
+                    entries[(entry['from'], entry['to'])] = entry
+        return entries
+
+
+async def resume_journal(
+    account_client: AccountClient,
+    journal: MintJournal
+) -> list[tuple[int, int]]:
+    """Settles the ranges left pending by a previous run and returns the
+    sorted list of ID ranges already minted."""
+    minted = []
+    pending = []
+    for (from_id, to_id), entry in journal.load().items():
+        if entry['status'] == STATUS_ACCEPTED:
+            minted.append((from_id, to_id))
+        elif entry['status'] == STATUS_SENT:
+            pending.append((from_id, to_id, int(entry['tx_hash'], 0)))
+
+    async def _settle(from_id: int, to_id: int, tx_hash: int):
+        try:
+            await account_client.wait_for_tx(tx_hash)
+        except TransactionFailedError:
+            journal.record(from_id, to_id, tx_hash, STATUS_FAILED)
+        else:
+            journal.record(from_id, to_id, tx_hash, STATUS_ACCEPTED)
+            minted.append((from_id, to_id))
+
+    if pending:
+        print(f"Checking {len(pending)} pending batches from the previous run...")
+        await asyncio.gather(*(_settle(*p) for p in pending))
+    minted.sort()
+    return minted
+
+
+def _unminted_ranges(
+    minted: list[tuple[int, int]],
+    from_id: int,
+    to_id: int
+) -> Iterator[tuple[int, int]]:
+    i = bisect.bisect_right(minted, (from_id, float('inf')))
+    if i > 0:
+        from_id = max(from_id, minted[i - 1][1] + 1)
+    for minted_from_id, minted_to_id in minted[i:]:
+        if minted_from_id > to_id:
+            break
+        if from_id < minted_from_id:
+            yield from_id, minted_from_id - 1
+        from_id = max(from_id, minted_to_id + 1)
+    if from_id <= to_id:
+        yield from_id, to_id
 
 
 async def batch_mint(
     account_client: AccountClient,
     calls: Calls,
     from_id: int,
-    to_id: int
-):
+    to_id: int,
+    max_fee: int,
+    nonce_manager: NonceManager,
+    journal: MintJournal
+) -> bool:
     print(f"Minting tokens from {from_id} to {to_id} at DerivativeToken...")
-    resp = await account_client.execute(calls=calls, max_fee=MAX_FEE * len(calls))
+    started = time.monotonic()
+    try:
+        resp = await execute_calls(account_client, calls, max_fee, nonce_manager)
+    except Exception:
+        journal.record(from_id, to_id, None, STATUS_FAILED)
+        raise
+    journal.record(from_id, to_id, resp.transaction_hash, STATUS_SENT)
     try:
-        await account_client.wait_for_tx(resp.transaction_hash)
+        await nonce_manager.wait_for_tx(resp.transaction_hash)
     except TransactionFailedError as e:
-        print(e, file=sys.stderr)
+        journal.record(from_id, to_id, resp.transaction_hash, STATUS_FAILED)
+        print(f"Failed to mint tokens from {from_id} to {to_id}: {e}", file=sys.stderr)
+        return False
+    journal.record(from_id, to_id, resp.transaction_hash, STATUS_ACCEPTED)
+    print(f"Minted tokens from {from_id} to {to_id} in {time.monotonic() - started:.1f}s")
+    return True
 
 
-async def mint_tokens(
+def prepare_mint_batch(
+    token_address: int,
+    to: int,
+    ids: list[int],
+    parent_token_addresses: list[int]
+) -> Call:
+    # One mintBatch call checks access and parent licenses once per batch
+    return load_interface(TOKEN_ABI_FILE).prepare(
+        token_address,
+        'mintBatch',
+        [to] * len(ids),
+        ids,
+        [len(parent_token_addresses)] * len(ids),
+        [{'collection': addr, 'id': id} for id in ids for addr in parent_token_addresses],
+        [0] * len(ids),
+        []
+    )
+
+
+async def _reverted_ids(
+    forked_state: ForkedState,
+    build: Callable[[list[int]], Call],
+    caller_address: int,
+    ids: list[int],
+    error: str
+) -> list[tuple[list[int], str]]:
+    # Bisects IDs reverting together down to the ones reverting on their own
+    if len(ids) == 1:
+        return [(ids, error)]
+    reverted = []
+    for half in (ids[:len(ids) // 2], ids[len(ids) // 2:]):
+        simulation = await forked_state.simulate(build(half), caller_address, apply=False)
+        if simulation.reverted:
+            reverted += await _reverted_ids(forked_state, build, caller_address, half, simulation.error)
+    # Halves that both succeed alone, e.g. under a step limit the whole
+    # exceeds, leave the IDs reverting only together
+    return reverted or [(ids, error)]
+
+
+async def dry_run_mint(
+    forked_state: ForkedState,
     account_client: AccountClient,
-    token_contract: Contract,
+    token_address: int,
     start_id: int,
     total_num: int,
-    parent_token_addresses: list[str]
+    parent_token_addresses: list[int],
+    minted: list[tuple[int, int]],
+    batch_size: int = BATCH_SIZE
 ):
-    id = start_id
-    batch_start_id = id
-    calls = []
-    while id < start_id + total_num:
-        calls.append(token_contract.functions['mint'].prepare(
-            account_client.address,
-            id,
-            [{'collection': int(addr, 0), 'id': id} for addr in parent_token_addresses],
-            []
-        ))
-        if len(calls) == BATCH_SIZE:
-            await batch_mint(account_client, calls, batch_start_id, id)
-            batch_start_id = id + 1
-            calls.clear()
-        id += 1
-    if calls:
-        await batch_mint(account_client, calls, batch_start_id, id - 1)
+    """Replays the mint batches against the forked state, reporting the
+    resources of each and the token IDs that would revert, without sending
+    anything. Batches that succeed are kept in the state, so that later
+    ones see their tokens."""
+    def _prepare_mint_batch(ids: list[int]) -> Call:
+        return prepare_mint_batch(token_address, account_client.address, ids, parent_token_addresses)
+
+    num_batches = 0
+    succeeded = []
+    for from_id, to_id in _unminted_ranges(minted, start_id, start_id + total_num - 1):
+        for id in range(from_id, to_id + 1, batch_size):
+            ids = list(range(id, min(id + batch_size, to_id + 1)))
+            num_batches += 1
+            simulation = await forked_state.simulate(_prepare_mint_batch(ids), account_client.address)
+            if not simulation.reverted:
+                succeeded.append(ids)
+                print(f"Batch from {ids[0]} to {ids[-1]} would succeed ({simulation.format_resources()})")
+                continue
+            print(f"Batch from {ids[0]} to {ids[-1]} would revert: {simulation.error}", file=sys.stderr)
+            reverted = await _reverted_ids(
+                forked_state, _prepare_mint_batch, account_client.address, ids, simulation.error)
+            for reverted_ids, error in reverted:
+                if len(reverted_ids) == 1:
+                    print(f"  Token {reverted_ids[0]} would revert: {error}", file=sys.stderr)
+                else:
+                    print(f"  Tokens from {reverted_ids[0]} to {reverted_ids[-1]} would revert together: {error}",
+                          file=sys.stderr)
+
+    num_minted = sum(len(ids) for ids in succeeded)
+    print(f"Dry run: {num_minted} tokens would be minted in {len(succeeded)}/{num_batches} batches, "
+          f"reading {forked_state.reader.reads} values from block {forked_state.reader.block_number}")
+
+
+async def granted_admins(
+    account_clients: list[AccountClient],
+    token_address: int
+) -> list[AccountClient]:
+    """Keeps the collection owner, which comes first, and the extra admin
+    accounts actually granted the admin role of the token."""
+    owner, *admins = account_clients
+    granted = await asyncio.gather(*(
+        owner.call_contract(Call(to_addr=token_address, selector=IS_ADMIN_SELECTOR, calldata=[admin.address]))
+        for admin in admins
+    ))
+    for admin, [is_admin] in zip(admins, granted):
+        if not is_admin:
+            print(f"Skipping 0x{admin.address:x}, which is not an admin of the token", file=sys.stderr)
+    return [owner] + [admin for admin, [is_admin] in zip(admins, granted) if is_admin]
+
+
+async def mint_tokens(
+    signer_pool: SignerPool,
+    token_address: int,
+    start_id: int,
+    total_num: int,
+    parent_token_addresses: list[int],
+    journal: MintJournal,
+    resume: bool = False
+):
+    # Tokens are all minted to the first signer whichever signer sends them
+    account_client = signer_pool.signers[0].account_client
+    minted = await resume_journal(account_client, journal) if resume else []
+    batcher = CallBatcher(account_client, signer_pool.signers[0].nonce_manager)
+    started = time.monotonic()
+
+    async def _batch_mint(signer: Signer, calls: Calls, from_id: int, to_id: int, max_fee: int) -> bool:
+        try:
+            return await batch_mint(
+                signer.account_client, calls, from_id, to_id, max_fee, signer.nonce_manager, journal)
+        finally:
+            await signer_pool.release(signer)
+
+    def _prepare_mint_batch(ids: list[int]) -> Call:
+        return prepare_mint_batch(token_address, account_client.address, ids, parent_token_addresses)
+
+    tasks = []
+    ranges = []
+    for from_id, to_id in _unminted_ranges(minted, start_id, start_id + total_num - 1):
+        id = from_id
+        while id <= to_id:
+            ids = list(range(id, min(id + batcher.batch_size, to_id + 1)))
+            try:
+                size, max_fee = await batcher.fit(ids, _prepare_mint_batch)
+            except ClientError as e:
+                journal.record(id, id, None, STATUS_FAILED)
+                print(f"Failed to mint token {id}: {e}", file=sys.stderr)
+                id += 1
+                continue
+            signer = await signer_pool.acquire()
+            ranges.append((id, id + size - 1))
+            tasks.append(asyncio.create_task(
+                _batch_mint(signer, _prepare_mint_batch(ids[:size]), id, id + size - 1, max_fee)))
+            id += size
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            print(result, file=sys.stderr)
+
+    elapsed = time.monotonic() - started
+    succeeded = [r for r, result in zip(ranges, results) if result is True]
+    num_minted = sum(to_id - from_id + 1 for from_id, to_id in succeeded)
+    print(f"Minted {num_minted} tokens in {len(succeeded)}/{len(tasks)} batches in {elapsed:.1f}s "
+          f"({len(succeeded) / elapsed:.2f} batches/s, {num_minted / elapsed:.2f} tokens/s)")
 
 
 async def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument(
-        '--token_address', dest='token_address', required=True,
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        '--token_address', dest='token_address',
         help='The address of the deployed DerivativeToken contract'
     )
+    target.add_argument(
+        '--collection', dest='collection',
+        help='The name of the recorded DerivativeToken deployment'
+    )
     parser.add_argument(
         '--derived_from', dest='parent_token_addresses', action='append',
         help='The list of addresses from which the token contract is derived'
     )
+    parser.add_argument(
+        '--derived_from_collection', dest='parent_collections', action='append',
+        help='The names (or glob patterns) of recorded deployments from which the token contract is derived'
+    )
     parser.add_argument(
         '--start', dest='start_id', type=int, required=True,
         help='The starting ID of tokens to mint'
@@ -81,22 +339,67 @@ async def main():
         '--total', dest='total_num', type=int, required=True,
         help='The total number of tokens to mint'
     )
-    args = parse_arguments(parser)
-
-    _, account_clients = create_clients(args)
-    token_contract = Contract(
-        args.token_address,
-        load_abi(TOKEN_ABI_FILE),
-        account_clients['comoco_admin']
+    parser.add_argument(
+        '--journal', dest='journal_file', default=JOURNAL_FILE,
+        help='The file recording the status of every minted batch'
+    )
+    parser.add_argument(
+        '--resume', dest='resume', action='store_true',
+        help='Skip the batches already minted according to the journal'
+    )
+    parser.add_argument(
+        '--window', dest='window', type=int, default=1,
+        help='The maximum number of mint transactions in flight at a time per signer'
+    )
+    parser.add_argument(
+        '--dry_run', dest='dry_run', action='store_true',
+        help='Replay the mint batches against a local fork of the network state instead of sending them'
     )
-    parent_token_addresses = args.parent_token_addresses or []
-    await mint_tokens(
-        account_clients['comoco_admin'],
-        token_contract,
-        args.start_id,
-        args.total_num,
-        parent_token_addresses
+    parser.add_argument(
+        '--signers', dest='max_signers', type=int,
+        help='The maximum number of admin accounts sending mint transactions, all of them if omitted'
     )
+    args = parse_arguments(parser)
+
+    gateway_client, account_clients = create_clients(args)
+    async with gateway_client:
+        if args.collection is not None:
+            token = DeploymentManifest().by_name(KIND_TOKEN, args.collection)
+            if token is None:
+                parser.error(f"no recorded DerivativeToken deployment named {args.collection}")
+            token_address = int(token['address'], 0)
+        else:
+            token_address = int(args.token_address, 0)
+        parent_token_addresses = [int(addr, 0) for addr in args.parent_token_addresses or []]
+        if args.parent_collections:
+            parent_token_addresses += select_addresses(KIND_TOKEN, args.parent_collections)
+        if args.dry_run:
+            journal = MintJournal(args.journal_file, token_address)
+            minted = sorted(
+                ids for ids, entry in journal.load().items() if entry['status'] == STATUS_ACCEPTED
+            ) if args.resume else []
+            await dry_run_mint(
+                await fork_state(gateway_client),
+                account_clients['comoco_admin'],
+                token_address,
+                args.start_id,
+                args.total_num,
+                parent_token_addresses,
+                minted
+            )
+            return
+
+        signers = await granted_admins(admin_clients(account_clients, args.max_signers), token_address)
+        print(f"Minting with {len(signers)} signers...")
+        await mint_tokens(
+            SignerPool(signers, args.window),
+            token_address,
+            args.start_id,
+            args.total_num,
+            parent_token_addresses,
+            MintJournal(args.journal_file, token_address),
+            args.resume
+        )
 
 
 if __name__ == '__main__':
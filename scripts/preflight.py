@@ -0,0 +1,148 @@
+import base64
+import dataclasses
+import gzip
+import json
+import re
+from typing import Optional
+
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.client_models import Calls
+from starknet_py.utils.iterable import ensure_iterable
+from starkware.starknet.business_logic.state.state import CachedState
+from starkware.starknet.business_logic.state.state_api import StateReader
+from starkware.starknet.business_logic.state.state_api_objects import BlockInfo
+from starkware.starknet.definitions.general_config import StarknetGeneralConfig
+from starkware.starknet.services.api.contract_class import ContractClass
+from starkware.starknet.testing.state import StarknetState
+from starkware.starkware_utils.error_handling import StarkException
+
+from gateway import ThrottledGatewayClient
+
+
+UNINITIALIZED_CONTRACT_ERROR = 'StarknetErrorCode.UNINITIALIZED_CONTRACT'
+
+ERROR_MESSAGE_PATTERN = re.compile(r'^Error message: (.*)$', re.MULTILINE)
+
+
+class GatewayStateReader(StateReader):
+    """Reads the state of the network at a block through the gateway on
+    demand, so that a state forked from it only fetches the classes and
+    storage cells that the simulated calls touch."""
+
+    def __init__(self, client: ThrottledGatewayClient, block_number: int):
+        self.client = client
+        self.block_number = block_number
+        self.reads = 0
+
+    async def get_contract_class(self, class_hash: bytes) -> ContractClass:
+        self.reads += 1
+        contract_class = await self.client.get_raw_class_by_hash(int.from_bytes(class_hash, 'big'))
+        if isinstance(contract_class['program'], str):
+            # Newer gateways serve the program compressed
+            contract_class['program'] = json.loads(gzip.decompress(base64.b64decode(contract_class['program'])))
+        return ContractClass.load(contract_class)
+
+    async def get_class_hash_at(self, contract_address: int) -> bytes:
+        self.reads += 1
+        try:
+            class_hash = await self.client.get_class_hash_at(contract_address, block_number=self.block_number)
+        except ClientError as e:
+            if UNINITIALIZED_CONTRACT_ERROR not in e.message:
+                raise
+            class_hash = 0
+        return class_hash.to_bytes(32, 'big')
+
+    async def get_nonce_at(self, contract_address: int) -> int:
+        self.reads += 1
+        return await self.client.get_contract_nonce(contract_address, block_number=self.block_number)
+
+    async def get_storage_at(self, contract_address: int, key: int) -> int:
+        self.reads += 1
+        return await self.client.get_storage_at(contract_address, key, block_number=self.block_number)
+
+
+@dataclasses.dataclass
+class Simulation:
+    error: Optional[str] = None
+    n_steps: int = 0
+    builtins: dict[str, int] = dataclasses.field(default_factory=dict)
+    storage_updates: int = 0
+
+    @property
+    def reverted(self) -> bool:
+        return self.error is not None
+
+    def format_resources(self) -> str:
+        builtins = ', '.join(f"{builtin}={count}" for builtin, count in sorted(self.builtins.items()))
+        return f"n_steps={self.n_steps}, storage_updates={self.storage_updates}, {builtins}"
+
+
+def _revert_reason(e: StarkException) -> str:
+    # The innermost error message is the one closest to the failed assertion
+    messages = ERROR_MESSAGE_PATTERN.findall(e.message or '')
+    return messages[-1] if messages else f"{e.code}: {(e.message or '').splitlines()[0]}"
+
+
+async def count_storage_updates(layer: CachedState, parent: StateReader) -> int:
+    """Counts the storage cells written in the layer whose value differs
+    from the one in the parent state, which is what a transaction pays for
+    in its state diff."""
+    storage_updates = 0
+    for (contract_address, key), value in layer.cache._storage_writes.items():
+        if value != await parent.get_storage_at(contract_address, key):
+            storage_updates += 1
+    return storage_updates
+
+
+class ForkedState:
+    """In-process StarkNet state layered over the network at a pinned block,
+    on which calls can be replayed before any of them is sent.
+
+    Calls are executed directly from the caller address, without going
+    through its account contract, so resources exclude the account's
+    validation and fees are not charged."""
+
+    def __init__(self, reader: GatewayStateReader, block_info: BlockInfo):
+        self.reader = reader
+        # Classes fetched through the reader are kept for the whole run
+        self.state = CachedState(block_info=block_info, state_reader=reader, contract_class_cache={})
+        self.general_config = StarknetGeneralConfig()
+
+    async def simulate(self, calls: Calls, caller_address: int, apply: bool = True) -> Simulation:
+        """Executes the calls in order as a multicall would, keeping their
+        changes only if every call succeeds and apply is set."""
+        layer = self.state._copy()
+        starknet_state = StarknetState(state=layer, general_config=self.general_config)
+        simulation = Simulation()
+        for call in ensure_iterable(calls):
+            try:
+                call_info = await starknet_state.execute_entry_point_raw(
+                    contract_address=call.to_addr,
+                    selector=call.selector,
+                    calldata=call.calldata,
+                    caller_address=caller_address
+                )
+            except StarkException as e:
+                simulation.error = _revert_reason(e)
+                return simulation
+            resources = call_info.execution_resources
+            simulation.n_steps += resources.n_steps
+            for builtin, count in resources.builtin_instance_counter.items():
+                simulation.builtins[builtin] = simulation.builtins.get(builtin, 0) + count
+
+        simulation.storage_updates = await count_storage_updates(layer, self.state)
+        if apply:
+            layer._apply(parent=self.state)
+        return simulation
+
+
+async def fork_state(client: ThrottledGatewayClient, block_number: Optional[int] = None) -> ForkedState:
+    """Forks the state at the given block, or the latest one, as the
+    calls would see it in the next block."""
+    block = await client.get_block(block_number='latest' if block_number is None else block_number)
+    block_info = BlockInfo.create_for_testing(
+        block_number=block.block_number + 1,
+        block_timestamp=block.timestamp,
+        gas_price=block.gas_price
+    )
+    return ForkedState(GatewayStateReader(client, block.block_number), block_info)
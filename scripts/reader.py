@@ -0,0 +1,101 @@
+import asyncio
+import csv
+import os
+from typing import AsyncIterator, Hashable, Iterable, Optional, Union
+
+from starknet_py.net.client_models import Call
+
+from gateway import MAX_CONCURRENT_REQUESTS, ThrottledGatewayClient
+
+
+class BulkReader:
+    """Runs view calls with a bounded number of them in flight, through a
+    client that already throttles and retries its requests."""
+
+    def __init__(
+        self,
+        client: ThrottledGatewayClient,
+        concurrency: int = MAX_CONCURRENT_REQUESTS,
+        block_number: Optional[int] = None
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.block_number = block_number
+
+    async def pin_block(self) -> int:
+        # Reads all target the same block so that the snapshot is consistent
+        if self.block_number is None:
+            block = await self.client.get_block(block_number='latest')
+            self.block_number = block.block_number
+        return self.block_number
+
+    async def call(self, call: Call) -> list[int]:
+        return await self.client.call_contract(call, block_number=self.block_number)
+
+    async def stream(
+        self,
+        calls: Iterable[tuple[Hashable, Call]]
+    ) -> AsyncIterator[tuple[Hashable, Union[list[int], Exception]]]:
+        """Yields the result (or the final error) of every keyed call in
+        completion order, pulling calls lazily so that memory stays bounded."""
+        pending = asyncio.Queue(self.concurrency * 2)
+        done = asyncio.Queue()
+
+        async def _produce():
+            for item in calls:
+                await pending.put(item)
+            for _ in range(self.concurrency):
+                await pending.put(None)
+
+        async def _work():
+            while (item := await pending.get()) is not None:
+                key, call = item
+                try:
+                    result = await self.call(call)
+                except Exception as e:
+                    result = e
+                await done.put((key, result))
+            await done.put(None)
+
+        tasks = [asyncio.create_task(_produce())]
+        tasks += [asyncio.create_task(_work()) for _ in range(self.concurrency)]
+        try:
+            running = self.concurrency
+            while running:
+                item = await done.get()
+                if item is None:
+                    running -= 1
+                else:
+                    yield item
+            await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class ColumnarWriter:
+    """Streams rows into one csv file per column under a directory, so that
+    each column can be loaded without reading the others."""
+
+    def __init__(self, output_dir: str, columns: dict[str, list[str]], key_name: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self._files = {}
+        self._writers = {}
+        for column, headers in columns.items():
+            f = open(os.path.join(output_dir, f"{column}.csv"), 'w', newline='')
+            self._files[column] = f
+            self._writers[column] = csv.writer(f)
+            self._writers[column].writerow([key_name, *headers])
+
+    def write(self, column: str, key, values: list):
+        self._writers[column].writerow([key, *values])
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
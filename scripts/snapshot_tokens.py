@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Iterator
+
+from starknet_py.net.client_models import Call
+
+from artifacts import load_interface
+from common import (
+    KIND_TOKEN,
+    DeploymentManifest,
+    create_gateway_client,
+    parse_arguments
+)
+from reader import BulkReader, ColumnarWriter
+
+
+TOKEN_ABI_FILE = os.path.join(
+    'artifacts', 'abis', 'DerivativeToken.json'
+)
+
+SNAPSHOT_DIR = 'snapshots'
+
+ERRORS_COLUMN = 'errors'
+
+FIELDS = {
+    'ownerOf': ['owner'],
+    'authorOf': ['author'],
+    'parentTokensOf': ['parent_tokens'],
+    'tokenURI': ['token_uri'],
+    'royalties': ['royalties']
+}
+
+
+def _format_value(field: str, value) -> str:
+    if field == 'tokenURI':
+        # Each felt holds up to 31 bytes of the URI without leading zeros
+        return b''.join(felt.to_bytes((felt.bit_length() + 7) // 8, 'big') for felt in value).decode(errors='replace')
+    if field == 'parentTokensOf':
+        return ' '.join(f"0x{token['collection']:x}:{token['id']}" for token in value)
+    if field == 'royalties':
+        return ' '.join(f"0x{royalty['receiver']:x}:{royalty['fraction']}" for royalty in value)
+    return f"0x{value:x}"
+
+
+async def snapshot_tokens(
+    reader: BulkReader,
+    token_address: int,
+    start_id: int,
+    total_num: int,
+    fields: list[str],
+    output_dir: str
+):
+    token_interface = load_interface(TOKEN_ABI_FILE)
+    block_number = await reader.pin_block()
+    print(f"Snapshotting tokens from {start_id} to {start_id + total_num - 1} "
+          f"at DerivativeToken at block {block_number}...")
+
+    def _prepare_reads() -> Iterator[tuple[tuple[int, str], Call]]:
+        for id in range(start_id, start_id + total_num):
+            for field in fields:
+                yield (id, field), token_interface.prepare(token_address, field, id)
+
+    columns = {field: FIELDS[field] for field in fields}
+    columns[ERRORS_COLUMN] = ['field', 'error']
+    num_reads = 0
+    num_errors = 0
+    started = time.monotonic()
+    with ColumnarWriter(output_dir, columns, 'token_id') as writer:
+        async for (id, field), result in reader.stream(_prepare_reads()):
+            num_reads += 1
+            if isinstance(result, Exception):
+                num_errors += 1
+                writer.write(ERRORS_COLUMN, id, [field, str(result)])
+            else:
+                value, = token_interface.decode(field, result)
+                writer.write(field, id, [_format_value(field, value)])
+
+    elapsed = time.monotonic() - started
+    print(f"Read {num_reads - num_errors}/{num_reads} values into {output_dir} in {elapsed:.1f}s "
+          f"({num_reads / elapsed:.2f} reads/s, {reader.client.throttle.retries} retries)")
+    if num_errors:
+        print(f"Failed {num_errors} reads, see {os.path.join(output_dir, ERRORS_COLUMN)}.csv", file=sys.stderr)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        '--token_address', dest='token_address',
+        help='The address of the deployed DerivativeToken contract'
+    )
+    target.add_argument(
+        '--collection', dest='collection',
+        help='The name of the recorded DerivativeToken deployment'
+    )
+    parser.add_argument(
+        '--start', dest='start_id', type=int, required=True,
+        help='The starting ID of tokens to snapshot'
+    )
+    parser.add_argument(
+        '--total', dest='total_num', type=int, required=True,
+        help='The total number of tokens to snapshot'
+    )
+    parser.add_argument(
+        '--field', dest='fields', action='append', choices=list(FIELDS),
+        help='The view functions to snapshot (all of them by default)'
+    )
+    parser.add_argument(
+        '--block', dest='block_number', type=int,
+        help='The block number to snapshot at (the latest block by default)'
+    )
+    parser.add_argument(
+        '--output_dir', dest='output_dir',
+        help='The directory to write one csv file per field into'
+    )
+    args = parse_arguments(parser)
+
+    if args.collection is not None:
+        token = DeploymentManifest().by_name(KIND_TOKEN, args.collection)
+        if token is None:
+            parser.error(f"no recorded DerivativeToken deployment named {args.collection}")
+        token_address = int(token['address'], 0)
+    else:
+        token_address = int(args.token_address, 0)
+    output_dir = args.output_dir or os.path.join(
+        SNAPSHOT_DIR, args.network, args.collection or f"0x{token_address:x}")
+    async with create_gateway_client(args) as gateway_client:
+        reader = BulkReader(gateway_client, args.concurrent_requests, block_number=args.block_number)
+        await snapshot_tokens(
+            reader,
+            token_address,
+            args.start_id,
+            args.total_num,
+            args.fields or list(FIELDS),
+            output_dir
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
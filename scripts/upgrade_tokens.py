@@ -3,19 +3,24 @@ import asyncio
 import os
 import sys
 
-from starknet_py.contract import Contract
 from starknet_py.net import AccountClient
-from starknet_py.net.client_models import Calls
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.client_models import Call, Calls
 from starknet_py.transaction_exceptions import TransactionFailedError
+from starkware.starknet.public.abi import get_selector_from_name
 
+from artifacts import load_compiled_contract, load_interface
 from common import (
-    MAX_FEE,
+    KIND_CLASS,
+    KIND_TOKEN,
+    CallBatcher,
+    NonceManager,
     create_clients,
     declare_contract,
-    load_abi,
-    load_compiled_contract,
+    execute_calls,
     parse_arguments,
-    save_hash
+    save_deployment,
+    select_addresses
 )
 
 
@@ -27,33 +32,89 @@ TOKEN_ABI_FILE = os.path.join(
     'artifacts', 'abis', 'DerivativeToken.json'
 )
 
+GET_IMPLEMENTATION_SELECTOR = get_selector_from_name('getImplementation')
+VERSION_SELECTOR = get_selector_from_name('version')
+
+MAX_CONCURRENT_CALLS = 20
+
 
 async def batch_upgrade(
     account_client: AccountClient,
     calls: Calls,
-):
-    print(f"Upgrading all DerivativeToken contracts...")
-    resp = await account_client.execute(calls=calls, max_fee=MAX_FEE * len(calls))
+    max_fee: int,
+    nonce_manager: NonceManager
+) -> bool:
+    print(f"Upgrading {len(calls)} DerivativeToken contracts...")
+    resp = await execute_calls(account_client, calls, max_fee, nonce_manager)
     try:
-        await account_client.wait_for_tx(resp.transaction_hash)
+        await nonce_manager.wait_for_tx(resp.transaction_hash)
     except TransactionFailedError as e:
         print(e, file=sys.stderr)
+        return False
+    return True
+
+
+async def verify_upgrade(
+    account_client: AccountClient,
+    token_address: int,
+    token_class_hash: int
+) -> str:
+    try:
+        [implementation] = await account_client.call_contract(Call(
+            to_addr=token_address, selector=GET_IMPLEMENTATION_SELECTOR, calldata=[]))
+        [version] = await account_client.call_contract(Call(
+            to_addr=token_address, selector=VERSION_SELECTOR, calldata=[]))
+    except ClientError as e:
+        return f"unreachable ({e.message})"
+    if implementation != token_class_hash:
+        return f"NOT upgraded (implementation 0x{implementation:x}, version {version})"
+    return f"upgraded (version {version})"
 
 
 async def upgrade_tokens(
     account_client: AccountClient,
-    token_addresses: list[str],
+    token_addresses: list[int],
     token_class_hash: int
-):
-    calls = []
-    for token_address in token_addresses:
-        token_contract = Contract(
-            token_address,
-            load_abi(TOKEN_ABI_FILE),
-            account_client
-        )
-        calls.append(token_contract.functions['upgrade'].prepare(token_class_hash))
-    await batch_upgrade(account_client, calls)
+) -> dict[int, str]:
+    # Every chunk is sized from fee estimates, which also isolates addresses
+    # that cannot be upgraded, and all chunks are in flight at once
+    token_interface = load_interface(TOKEN_ABI_FILE)
+    calls = [
+        token_interface.prepare(token_address, 'upgrade', token_class_hash)
+        for token_address in token_addresses
+    ]
+    nonce_manager = NonceManager(account_client)
+    batcher = CallBatcher(account_client, nonce_manager)
+    chunks = []
+    tasks = []
+    while calls:
+        try:
+            size, max_fee = await batcher.fit(calls)
+        except ClientError as e:
+            print(f"Cannot upgrade 0x{calls[0].to_addr:x}: {e.message}", file=sys.stderr)
+            calls = calls[1:]
+            continue
+        chunks.append([call.to_addr for call in calls[:size]])
+        tasks.append(asyncio.create_task(batch_upgrade(account_client, calls[:size], max_fee, nonce_manager)))
+        calls = calls[size:]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            addresses = ', '.join(f"0x{address:x}" for address in chunk)
+            print(f"Failed to upgrade {addresses}: {result}", file=sys.stderr)
+
+    print("Verifying DerivativeToken implementations...")
+    concurrent_calls = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+
+    async def _verify_upgrade(token_address: int) -> str:
+        async with concurrent_calls:
+            return await verify_upgrade(account_client, token_address, token_class_hash)
+
+    results = await asyncio.gather(*(_verify_upgrade(token_address) for token_address in token_addresses))
+    report = dict(zip(token_addresses, results))
+    for token_address, result in report.items():
+        print(f"0x{token_address:x}: {result}")
+    return report
 
 
 async def main():
@@ -62,22 +123,36 @@ async def main():
         '--token_address', dest='token_addresses', action='append',
         help='The list of DerivativeToken addresses for whose implementation to upgrade'
     )
+    parser.add_argument(
+        '--collection', dest='collections', action='append',
+        help='The names (or glob patterns such as BAYC*) of recorded DerivativeToken deployments to upgrade'
+    )
     args = parse_arguments(parser)
-    _, account_clients = create_clients(args)
+    gateway_client, account_clients = create_clients(args)
 
-    print("Declaring DerivativeToken class...")
-    token_declare_result = await declare_contract(
-        account_clients['comoco_dev'],
-        load_compiled_contract(COMPILED_TOKEN_FILE)
-    )
-    save_hash('Token Class', token_declare_result.class_hash)
+    async with gateway_client:
+        token_addresses = [int(token_address, 0) for token_address in args.token_addresses or []]
+        if args.collections:
+            token_addresses += select_addresses(KIND_TOKEN, args.collections)
+        token_addresses = list(dict.fromkeys(token_addresses))
 
-    if args.token_addresses:
-        await upgrade_tokens(
+        print("Declaring DerivativeToken class...")
+        token_declare_result = await declare_contract(
             account_clients['comoco_dev'],
-            args.token_addresses,
-            token_declare_result.class_hash
+            load_compiled_contract(COMPILED_TOKEN_FILE)
         )
+        save_deployment(
+            'DerivativeToken', KIND_CLASS,
+            class_hash=token_declare_result.class_hash,
+            tx_hash=token_declare_result.hash
+        )
+
+        if token_addresses:
+            await upgrade_tokens(
+                account_clients['comoco_dev'],
+                token_addresses,
+                token_declare_result.class_hash
+            )
 
 
 if __name__ == '__main__':
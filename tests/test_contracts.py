@@ -1,84 +1,28 @@
 import os
 import pytest
 
+import openzeppelin
 from nile.utils import assert_revert, str_to_felt, to_uint
-from starkware.starknet.public.abi import get_selector_from_name
-from starkware.starknet.testing.starknet import Starknet, StarknetContract
+from starkware.starknet.public.abi import get_selector_from_name, get_storage_var_address
+
+from contracts_setup import COLLECTION_OWNER_ADDRESS, NAME, PROXY_ADMIN_ADDRESS, SYMBOL
 
 
-PROXY_ADMIN_ADDRESS = 0x1111111111111111111111111111111111111111
-COLLECTION_OWNER_ADDRESS = 0x2222222222222222222222222222222222222222
 COLLECTION_ADMIN_ADDRESS = 0x3333333333333333333333333333333333333333
 
-PROXY_FILE = os.path.join('contracts', 'proxy', 'Proxy.cairo')
-REGISTRY_FILE = os.path.join('contracts', 'registry', 'TokenRegistry.cairo')
-TOKEN_FILE = os.path.join('contracts', 'token', 'DerivativeToken.cairo')
+# An Ownable collection that knows nothing about the registry
+OWNABLE_TOKEN_FILE = os.path.join(openzeppelin.__path__[0], 'token', 'erc721', 'presets', 'ERC721MintableBurnable.cairo')
 
-INITIALIZER_SELECTOR = get_selector_from_name('initializer')
-NAME = str_to_felt('name')
-SYMBOL = str_to_felt('symbol')
+PRIMARY_TOKEN_ADDRESS_CHANGED_SELECTOR = get_selector_from_name('PrimaryTokenAddressChanged')
 
 ORIGINAL_TOKEN_ID = to_uint(10)
 ORIGINAL_TOKEN_OWNER_ADDRESS = 0xAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
 DERIVED_TOKEN_ID = to_uint(11)
 DERIVED_TOKEN_OWNER_ADDRESS = 0xBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBB
 
-
-@pytest.fixture(scope='module')
-async def contracts_init():
-    starknet = await Starknet.empty()
-
-    registry_class = await starknet.declare(REGISTRY_FILE)
-    token_class = await starknet.declare(TOKEN_FILE)
-
-    registry_contract = await starknet.deploy(
-        source=PROXY_FILE,
-        constructor_calldata=[
-            registry_class.class_hash,
-            INITIALIZER_SELECTOR,
-            1,
-            PROXY_ADMIN_ADDRESS
-        ]
-    )
-    registry_contract = registry_contract.replace_abi(registry_class.abi)
-
-    token_contract = await starknet.deploy(
-        source=PROXY_FILE,
-        constructor_calldata=[
-            token_class.class_hash,
-            INITIALIZER_SELECTOR,
-            5,
-            PROXY_ADMIN_ADDRESS,
-            NAME,
-            SYMBOL,
-            COLLECTION_OWNER_ADDRESS,
-            registry_contract.contract_address
-        ]
-    )
-    token_contract = token_contract.replace_abi(token_class.abi)
-
-    return starknet.state, registry_contract, token_contract
-
-
-@pytest.fixture
-def contracts_factory(contracts_init):
-    state, registry_contract, token_contract = contracts_init
-
-    _state = state.copy()
-    registry_contract = StarknetContract(
-        _state,
-        registry_contract.abi,
-        registry_contract.contract_address,
-        registry_contract.deploy_call_info
-    )
-    token_contract = StarknetContract(
-        _state,
-        token_contract.abi,
-        token_contract.contract_address,
-        token_contract.deploy_call_info
-    )
-
-    return registry_contract, token_contract
+SECONDARY_TOKEN_KEY = get_storage_var_address('RegistryProxy_secondary_token')
+SECONDARY_TOKEN = 1
+NOT_SECONDARY_TOKEN = 2
 
 
 @pytest.mark.asyncio
@@ -99,6 +43,63 @@ async def test_TokenRegistry(contracts_factory):
     assert execution_info.result == (0,)
 
 
+async def deploy_ownable_token(contract_classes, registry_contract):
+    ownable_token_address, _ = await registry_contract.state.deploy(
+        contract_class=contract_classes.get(OWNABLE_TOKEN_FILE),
+        constructor_calldata=[NAME, SYMBOL, COLLECTION_OWNER_ADDRESS]
+    )
+    return ownable_token_address
+
+
+@pytest.mark.asyncio
+async def test_TokenRegistry_callback(contracts_factory, contract_classes):
+    registry_contract, token_contract = contracts_factory
+    ownable_token_address = await deploy_ownable_token(contract_classes, registry_contract)
+
+    await registry_contract.setPrimaryTokenAddress(ownable_token_address, 0xDEADBEEF).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await registry_contract.getPrimaryTokenAddress(ownable_token_address).call()
+    assert execution_info.result == (0xDEADBEEF,)
+    execution_info = await registry_contract.isPrimaryTokenCallbackEnabled(ownable_token_address).call()
+    assert execution_info.result == (0,)
+
+    execution_info = await registry_contract.isPrimaryTokenCallbackEnabled(token_contract.contract_address).call()
+    assert execution_info.result == (0,)
+    await token_contract.syncPrimaryTokenAddress().execute()
+    execution_info = await registry_contract.isPrimaryTokenCallbackEnabled(token_contract.contract_address).call()
+    assert execution_info.result == (1,)
+
+    await token_contract.upgradeRegistry(0xDEADBEEF).execute(caller_address=PROXY_ADMIN_ADDRESS)
+    execution_info = await registry_contract.isPrimaryTokenCallbackEnabled(token_contract.contract_address).call()
+    assert execution_info.result == (0,)
+
+
+@pytest.mark.asyncio
+async def test_TokenRegistry_batch(contracts_factory, contract_classes):
+    registry_contract, token_contract = contracts_factory
+    ownable_token_address = await deploy_ownable_token(contract_classes, registry_contract)
+    await token_contract.syncPrimaryTokenAddress().execute()
+
+    secondary_addrs = [ownable_token_address, token_contract.contract_address]
+    await assert_revert(
+        registry_contract.setPrimaryTokenAddresses(secondary_addrs, [0xDEADBEEF]).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="array lengths mismatch")
+    await assert_revert(
+        registry_contract.setPrimaryTokenAddresses(secondary_addrs, [0xDEADBEEF, 0xBEEF]).execute(),
+        reverted_with="caller is not contract owner")
+
+    execution_info = await registry_contract.setPrimaryTokenAddresses(secondary_addrs, [0xDEADBEEF, 0xBEEF]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    events = [event for event in execution_info.raw_events if event.keys == [PRIMARY_TOKEN_ADDRESS_CHANGED_SELECTOR]]
+    assert [event.data[2] for event in events] == [0xDEADBEEF, 0xBEEF]
+    execution_info = await registry_contract.getPrimaryTokenAddresses(secondary_addrs).call()
+    assert execution_info.result == ([0xDEADBEEF, 0xBEEF],)
+    value = await registry_contract.state.state.get_storage_at(token_contract.contract_address, SECONDARY_TOKEN_KEY)
+    assert value == SECONDARY_TOKEN
+
+    await registry_contract.setPrimaryTokenAddresses(secondary_addrs, [0, 0]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    value = await registry_contract.state.state.get_storage_at(token_contract.contract_address, SECONDARY_TOKEN_KEY)
+    assert value == NOT_SECONDARY_TOKEN
+
+
 @pytest.mark.asyncio
 async def test_DerivativeToken_access(contracts_factory):
     _, token_contract = contracts_factory
@@ -147,6 +148,31 @@ async def test_DerivativeToken_royalties(contracts_factory):
     assert execution_info.result == ([(123, 5), (456, 10), (789, 15)],)
 
 
+@pytest.mark.asyncio
+async def test_DerivativeToken_royaltiesOf(contracts_factory):
+    _, token_contract = contracts_factory
+
+    await token_contract.mintBatch([ORIGINAL_TOKEN_OWNER_ADDRESS] * 2, [ORIGINAL_TOKEN_ID, DERIVED_TOKEN_ID], [0, 0], [], [0, 0], []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await assert_revert(
+        token_contract.setCollectionArraySettings(str_to_felt('royalties'), [123, 5, 456]).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="receiver and fraction pairs")
+    await assert_revert(
+        token_contract.setTokenArraySettings(ORIGINAL_TOKEN_ID, str_to_felt('royalties'), [456, 10] * 9).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="too many royalties")
+
+    await token_contract.setCollectionArraySettings(str_to_felt('royalties'), [123, 5]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.setTokenArraySettings(ORIGINAL_TOKEN_ID, str_to_felt('royalties'), [456, 10]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    await token_contract.setAuthorArraySettings(DERIVED_TOKEN_ID, str_to_felt('royalties'), [789, 15]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+
+    execution_info = await token_contract.royaltiesOf([ORIGINAL_TOKEN_ID, DERIVED_TOKEN_ID]).call()
+    assert execution_info.result == ([2, 2], [(123, 5), (456, 10), (123, 5), (789, 15)])
+    execution_info = await token_contract.royaltiesOf([]).call()
+    assert execution_info.result == ([], [])
+    await assert_revert(
+        token_contract.royaltiesOf([ORIGINAL_TOKEN_ID, to_uint(12)]).call(),
+        reverted_with="nonexistent token")
+
+
 @pytest.mark.asyncio
 async def test_DerivativeToken_mint(contracts_factory):
     _, token_contract = contracts_factory
@@ -175,6 +201,199 @@ async def test_DerivativeToken_mint(contracts_factory):
     assert execution_info.result == ([(token_contract.contract_address, ORIGINAL_TOKEN_ID)],)
 
 
+@pytest.mark.asyncio
+async def test_DerivativeToken_baseURI(contracts_factory):
+    _, token_contract = contracts_factory
+
+    LARGE_TOKEN_ID = to_uint(10 ** 35 + 7)
+    await token_contract.mint(ORIGINAL_TOKEN_OWNER_ADDRESS, ORIGINAL_TOKEN_ID, [], [str_to_felt('<CID>')]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.mint(ORIGINAL_TOKEN_OWNER_ADDRESS, DERIVED_TOKEN_ID, [], []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.mint(ORIGINAL_TOKEN_OWNER_ADDRESS, LARGE_TOKEN_ID, [], []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+
+    await assert_revert(
+        token_contract.setBaseURI([str_to_felt('ipfs://')]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="caller is not owner or admin")
+    await token_contract.setBaseURI([str_to_felt('ipfs://')]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.baseURI().call()
+    assert execution_info.result == ([str_to_felt('ipfs://')],)
+    execution_info = await token_contract.tokenURI(ORIGINAL_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('<CID>')],)
+    execution_info = await token_contract.tokenURI(DERIVED_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://')],)
+
+    await token_contract.setTokenIdSuffix(1).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.tokenURI(ORIGINAL_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('<CID>')],)
+    execution_info = await token_contract.tokenURI(DERIVED_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('11')],)
+    execution_info = await token_contract.tokenURI(LARGE_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('10000'), str_to_felt('0' * 30 + '7')],)
+
+    await token_contract.setTokenURI(ORIGINAL_TOKEN_ID, [str_to_felt('<CID>'), str_to_felt('/0.json')]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.tokenURI(ORIGINAL_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('<CID>'), str_to_felt('/0.json')],)
+    await token_contract.setTokenURI(ORIGINAL_TOKEN_ID, [str_to_felt('<CID2>')]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.tokenURI(ORIGINAL_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('<CID2>')],)
+    await token_contract.setTokenURI(ORIGINAL_TOKEN_ID, []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.tokenURI(ORIGINAL_TOKEN_ID).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('10')],)
+
+
+@pytest.mark.asyncio
+async def test_DerivativeToken_mintBatch(contracts_factory):
+    _, token_contract = contracts_factory
+
+    await token_contract.mint(ORIGINAL_TOKEN_OWNER_ADDRESS, ORIGINAL_TOKEN_ID, [], []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    parent_token = (token_contract.contract_address, ORIGINAL_TOKEN_ID)
+    token_ids = [to_uint(20), to_uint(21), to_uint(22)]
+
+    await assert_revert(
+        token_contract.mintBatch([DERIVED_TOKEN_OWNER_ADDRESS] * 3, token_ids, [1, 1, 1], [parent_token] * 3, [0, 0, 0], []).execute(),
+        reverted_with="caller is not owner or admin")
+    await assert_revert(
+        token_contract.mintBatch([DERIVED_TOKEN_OWNER_ADDRESS] * 3, token_ids, [1, 1, 1], [parent_token] * 3, [0, 0, 0], []).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="not licensed")
+    await assert_revert(
+        token_contract.mintBatch([DERIVED_TOKEN_OWNER_ADDRESS] * 3, token_ids, [1, 1, 1], [parent_token] * 2, [0, 0, 0], []).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="array lengths mismatch")
+
+    await token_contract.setTokenArraySettings(ORIGINAL_TOKEN_ID, str_to_felt('licensees'), [DERIVED_TOKEN_OWNER_ADDRESS]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    await token_contract.mintBatch(
+        [DERIVED_TOKEN_OWNER_ADDRESS, DERIVED_TOKEN_OWNER_ADDRESS, ORIGINAL_TOKEN_OWNER_ADDRESS],
+        token_ids,
+        [1, 1, 0],
+        [parent_token] * 2,
+        [2, 0, 1],
+        [str_to_felt('ipfs://'), str_to_felt('<CID>'), str_to_felt('<URI>')]
+    ).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+
+    execution_info = await token_contract.ownerOf(token_ids[1]).call()
+    assert execution_info.result == (DERIVED_TOKEN_OWNER_ADDRESS,)
+    execution_info = await token_contract.authorOf(token_ids[2]).call()
+    assert execution_info.result == (ORIGINAL_TOKEN_OWNER_ADDRESS,)
+    execution_info = await token_contract.parentTokensOf(token_ids[0]).call()
+    assert execution_info.result == ([parent_token],)
+    execution_info = await token_contract.parentTokensOf(token_ids[2]).call()
+    assert execution_info.result == ([],)
+    execution_info = await token_contract.tokenURI(token_ids[0]).call()
+    assert execution_info.result == ([str_to_felt('ipfs://'), str_to_felt('<CID>')],)
+    execution_info = await token_contract.tokenURI(token_ids[2]).call()
+    assert execution_info.result == ([str_to_felt('<URI>')],)
+
+
+@pytest.mark.asyncio
+async def test_DerivativeToken_parentTokens(contracts_factory):
+    _, token_contract = contracts_factory
+
+    token_ids = [to_uint(10), to_uint(11), to_uint(12), to_uint(13)]
+    tokens = [(token_contract.contract_address, token_id) for token_id in token_ids]
+    await token_contract.mintBatch([ORIGINAL_TOKEN_OWNER_ADDRESS] * 4, token_ids, [0] * 4, [], [0] * 4, []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+
+    await token_contract.setParentTokens(token_ids[3], tokens[:2]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.addParentTokens(token_ids[3], [tokens[2]]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await assert_revert(
+        token_contract.addParentTokens(token_ids[3], [tokens[1]]).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="already a parent token")
+    execution_info = await token_contract.parentTokensOf(token_ids[3]).call()
+    assert sorted(execution_info.result.parentTokens) == tokens[:3]
+
+    await token_contract.removeParentTokens(token_ids[3], [tokens[0]]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await assert_revert(
+        token_contract.removeParentTokens(token_ids[3], [tokens[0]]).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="not a parent token")
+    execution_info = await token_contract.parentTokensOf(token_ids[3]).call()
+    assert sorted(execution_info.result.parentTokens) == tokens[1:3]
+    execution_info = await token_contract.isParentToken(token_ids[3], tokens[0]).call()
+    assert execution_info.result == (0,)
+
+    await token_contract.removeParentTokens(token_ids[3], [tokens[2], tokens[1]]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.parentTokensOf(token_ids[3]).call()
+    assert execution_info.result == ([],)
+    await assert_revert(
+        token_contract.removeParentTokens(to_uint(14), [tokens[0]]).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="remove parent tokens for nonexistent token")
+
+
+@pytest.mark.asyncio
+async def test_DerivativeToken_licensees(contracts_factory):
+    _, token_contract = contracts_factory
+
+    LICENSEE_ADDRESSES = [0xC1, 0xC2, 0xC3]
+    await token_contract.mint(ORIGINAL_TOKEN_OWNER_ADDRESS, ORIGINAL_TOKEN_ID, [], []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+
+    await assert_revert(
+        token_contract.setTokenArraySettings(ORIGINAL_TOKEN_ID, str_to_felt('licensees'), [DERIVED_TOKEN_OWNER_ADDRESS] * 2).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="duplicate licensee")
+    await token_contract.setTokenArraySettings(ORIGINAL_TOKEN_ID, str_to_felt('licensees'), [DERIVED_TOKEN_OWNER_ADDRESS, LICENSEE_ADDRESSES[0]]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    await token_contract.addTokenLicensee(ORIGINAL_TOKEN_ID, LICENSEE_ADDRESSES[1]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    await assert_revert(
+        token_contract.addTokenLicensee(ORIGINAL_TOKEN_ID, LICENSEE_ADDRESSES[1]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="already a licensee")
+    execution_info = await token_contract.allowToMint(ORIGINAL_TOKEN_ID, LICENSEE_ADDRESSES[1]).call()
+    assert execution_info.result == (1,)
+
+    await token_contract.removeTokenLicensee(ORIGINAL_TOKEN_ID, DERIVED_TOKEN_OWNER_ADDRESS).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    await assert_revert(
+        token_contract.removeTokenLicensee(ORIGINAL_TOKEN_ID, DERIVED_TOKEN_OWNER_ADDRESS).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="not a licensee")
+    execution_info = await token_contract.allowToMint(ORIGINAL_TOKEN_ID, DERIVED_TOKEN_OWNER_ADDRESS).call()
+    assert execution_info.result == (0,)
+    execution_info = await token_contract.tokenArraySettings(ORIGINAL_TOKEN_ID, str_to_felt('licensees')).call()
+    assert sorted(execution_info.result.values) == LICENSEE_ADDRESSES[:2]
+
+    await assert_revert(
+        token_contract.addCollectionLicensee(LICENSEE_ADDRESSES[2]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS))
+    await token_contract.addCollectionLicensee(LICENSEE_ADDRESSES[2]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.allowToMint(ORIGINAL_TOKEN_ID, LICENSEE_ADDRESSES[2]).call()
+    assert execution_info.result == (1,)
+    await token_contract.removeCollectionLicensee(LICENSEE_ADDRESSES[2]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    execution_info = await token_contract.allowToMint(ORIGINAL_TOKEN_ID, LICENSEE_ADDRESSES[2]).call()
+    assert execution_info.result == (0,)
+    execution_info = await token_contract.collectionArraySettings(str_to_felt('licensees')).call()
+    assert execution_info.result == ([],)
+
+
+@pytest.mark.asyncio
+async def test_DerivativeToken_settingsBatch(contracts_factory):
+    _, token_contract = contracts_factory
+
+    LICENSEE_ADDRESSES = [0xC1, 0xC2]
+    token_ids = [to_uint(20), to_uint(21), to_uint(22)]
+    await token_contract.mintBatch([ORIGINAL_TOKEN_OWNER_ADDRESS] * 3, token_ids, [0] * 3, [], [0] * 3, []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.mint(DERIVED_TOKEN_OWNER_ADDRESS, DERIVED_TOKEN_ID, [], []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+
+    await assert_revert(
+        token_contract.setTokenSettingsBatch(token_ids + [DERIVED_TOKEN_ID], str_to_felt('allow_transfer'), [2]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="caller is not token owner")
+    await assert_revert(
+        token_contract.setTokenSettingsBatch(token_ids, str_to_felt('allow_transfer'), [2, 1]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="array lengths mismatch")
+    await token_contract.setTokenSettingsBatch(token_ids, str_to_felt('allow_transfer'), [2]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    await token_contract.setTokenSettingsBatch(token_ids[1:], str_to_felt('drag_along'), [1, 2]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    for token_id in token_ids:
+        execution_info = await token_contract.allowToTransfer(token_id).call()
+        assert execution_info.result == (0,)
+    execution_info = await token_contract.tokenSettings(token_ids[2], str_to_felt('drag_along')).call()
+    assert execution_info.result == (2,)
+
+    await token_contract.setTokenArraySettingsBatch(token_ids, str_to_felt('licensees'), [1], LICENSEE_ADDRESSES[:1]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    await token_contract.setTokenArraySettingsBatch(token_ids[:2], str_to_felt('licensees'), [0, 2], LICENSEE_ADDRESSES).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    execution_info = await token_contract.allowToMint(token_ids[0], LICENSEE_ADDRESSES[0]).call()
+    assert execution_info.result == (0,)
+    execution_info = await token_contract.allowToMint(token_ids[1], LICENSEE_ADDRESSES[1]).call()
+    assert execution_info.result == (1,)
+    execution_info = await token_contract.allowToMint(token_ids[2], LICENSEE_ADDRESSES[0]).call()
+    assert execution_info.result == (1,)
+
+    await assert_revert(
+        token_contract.setAuthorArraySettingsBatch([DERIVED_TOKEN_ID], str_to_felt('royalties'), [2], [789, 15]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="caller is not token author")
+    await token_contract.setAuthorArraySettingsBatch(token_ids, str_to_felt('royalties'), [2], [789, 15]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    execution_info = await token_contract.royaltiesOf(token_ids).call()
+    assert execution_info.result == ([1, 1, 1], [(789, 15)] * 3)
+
+
 @pytest.mark.asyncio
 async def test_DerivativeToken_transfer(contracts_factory):
     _, token_contract = contracts_factory
@@ -184,7 +403,7 @@ async def test_DerivativeToken_transfer(contracts_factory):
 
     execution_info = await token_contract.allowToTransfer(ORIGINAL_TOKEN_ID).call()
     assert execution_info.result == (1,)
-    execution_info = await token_contract.allowTransfer(DERIVED_TOKEN_ID).call()
+    execution_info = await token_contract.allowTransferring(DERIVED_TOKEN_ID).call()
     assert execution_info.result == (1,)
 
     await token_contract.setCollectionSettings(str_to_felt('allow_transfer'), 1).execute(caller_address=COLLECTION_OWNER_ADDRESS)
@@ -192,7 +411,7 @@ async def test_DerivativeToken_transfer(contracts_factory):
     assert execution_info.result == (1,)
     execution_info = await token_contract.allowToTransfer(ORIGINAL_TOKEN_ID).call()
     assert execution_info.result == (1,)
-    execution_info = await token_contract.allowTransfer(DERIVED_TOKEN_ID).call()
+    execution_info = await token_contract.allowTransferring(DERIVED_TOKEN_ID).call()
     assert execution_info.result == (1,)
 
     await token_contract.setTokenSettings(ORIGINAL_TOKEN_ID, str_to_felt('allow_transfer'), 2).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
@@ -200,5 +419,61 @@ async def test_DerivativeToken_transfer(contracts_factory):
     assert execution_info.result == (2,)
     execution_info = await token_contract.allowToTransfer(ORIGINAL_TOKEN_ID).call()
     assert execution_info.result == (0,)
-    execution_info = await token_contract.allowTransfer(DERIVED_TOKEN_ID).call()
+    execution_info = await token_contract.allowTransferring(DERIVED_TOKEN_ID).call()
+    assert execution_info.result == (0,)
+
+
+@pytest.mark.asyncio
+async def test_DerivativeToken_secondary(contracts_factory):
+    registry_contract, token_contract = contracts_factory
+
+    await token_contract.mint(ORIGINAL_TOKEN_OWNER_ADDRESS, ORIGINAL_TOKEN_ID, [], []).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await assert_revert(
+        token_contract.onPrimaryTokenAddressChanged(0xDEADBEEF).execute(caller_address=COLLECTION_OWNER_ADDRESS),
+        reverted_with="caller is not the registry")
+
+    await registry_contract.setPrimaryTokenAddress(token_contract.contract_address, 0xDEADBEEF).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await assert_revert(
+        token_contract.transferFrom(ORIGINAL_TOKEN_OWNER_ADDRESS, DERIVED_TOKEN_OWNER_ADDRESS, ORIGINAL_TOKEN_ID).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="cannot transfer secondary token")
+
+    await registry_contract.setPrimaryTokenAddress(token_contract.contract_address, 0).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.syncPrimaryTokenAddress().execute()
+    await token_contract.transferFrom(ORIGINAL_TOKEN_OWNER_ADDRESS, DERIVED_TOKEN_OWNER_ADDRESS, ORIGINAL_TOKEN_ID).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    execution_info = await token_contract.ownerOf(ORIGINAL_TOKEN_ID).call()
+    assert execution_info.result == (DERIVED_TOKEN_OWNER_ADDRESS,)
+
+
+@pytest.mark.asyncio
+async def test_DerivativeToken_transfer_ancestors(contracts_factory):
+    _, token_contract = contracts_factory
+
+    # A diamond of tokens: 13 is derived from 11 and 12, both derived from 10
+    token_ids = [to_uint(10), to_uint(11), to_uint(12), to_uint(13)]
+    tokens = [(token_contract.contract_address, token_id) for token_id in token_ids]
+    await token_contract.mintBatch(
+        [ORIGINAL_TOKEN_OWNER_ADDRESS] * 4,
+        token_ids,
+        [0, 1, 1, 2],
+        [tokens[0], tokens[0], tokens[1], tokens[2]],
+        [0] * 4,
+        []
+    ).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+
+    execution_info = await token_contract.transferLicense(token_ids[3]).call()
+    assert execution_info.result == (1, [tokens[1], tokens[2]])
+    execution_info = await token_contract.allowTransferring(token_ids[3]).call()
+    assert execution_info.result == (1,)
+
+    await token_contract.setTokenSettings(token_ids[0], str_to_felt('allow_transfer'), 2).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    execution_info = await token_contract.allowTransferring(token_ids[3]).call()
     assert execution_info.result == (0,)
+    await assert_revert(
+        token_contract.transferFrom(ORIGINAL_TOKEN_OWNER_ADDRESS, DERIVED_TOKEN_OWNER_ADDRESS, token_ids[3]).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS),
+        reverted_with="not licensed to transfer")
+
+    # A cycle in the derivation graph is visited only once
+    await token_contract.setParentTokens(token_ids[0], [tokens[3]]).execute(caller_address=COLLECTION_OWNER_ADDRESS)
+    await token_contract.setTokenSettings(token_ids[0], str_to_felt('allow_transfer'), 1).execute(caller_address=ORIGINAL_TOKEN_OWNER_ADDRESS)
+    execution_info = await token_contract.allowTransferring(token_ids[3]).call()
+    assert execution_info.result == (1,)